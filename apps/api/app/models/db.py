@@ -4,7 +4,7 @@ from datetime import datetime, timezone
 from typing import Optional
 from uuid import uuid4
 
-from sqlalchemy import Column, JSON
+from sqlalchemy import Column, Index, JSON
 from sqlmodel import Field, SQLModel
 
 
@@ -49,8 +49,10 @@ class Artifact(SQLModel, table=True):
 
 
 class AgentRun(SQLModel, table=True):
+    __table_args__ = (Index("ix_agentrun_project_created_id", "project_id", "created_at", "id"),)
+
     id: str = Field(default_factory=lambda: uuid4().hex, primary_key=True)
-    project_id: str = Field(index=True)
+    project_id: str
     status: str
     created_at: datetime = Field(default_factory=_now)
     plan: Optional[dict] = Field(default=None, sa_column=Column(JSON))
@@ -58,8 +60,10 @@ class AgentRun(SQLModel, table=True):
 
 
 class AgentSnapshot(SQLModel, table=True):
+    __table_args__ = (Index("ix_agentsnapshot_project_created_id", "project_id", "created_at", "id"),)
+
     id: str = Field(default_factory=lambda: uuid4().hex, primary_key=True)
-    project_id: str = Field(index=True)
+    project_id: str
     run_id: Optional[str] = Field(default=None, index=True)
     kind: str
     target_path: str
@@ -68,8 +72,14 @@ class AgentSnapshot(SQLModel, table=True):
 
 
 class AgentArtifact(SQLModel, table=True):
+    __table_args__ = (
+        Index("ux_agentartifact_project_run_path", "project_id", "run_id", "path", unique=True),
+        Index("ix_agentartifact_project_created_id", "project_id", "created_at", "id"),
+        Index("ix_agentartifact_project_run_created_id", "project_id", "run_id", "created_at", "id"),
+    )
+
     id: str = Field(default_factory=lambda: uuid4().hex, primary_key=True)
-    project_id: str = Field(index=True)
+    project_id: str
     run_id: Optional[str] = Field(default=None, index=True)
     snapshot_id: Optional[str] = Field(default=None, index=True)
     type: str
@@ -80,8 +90,10 @@ class AgentArtifact(SQLModel, table=True):
 
 
 class AgentRollback(SQLModel, table=True):
+    __table_args__ = (Index("ix_agentrollback_project_created_id", "project_id", "created_at", "id"),)
+
     id: str = Field(default_factory=lambda: uuid4().hex, primary_key=True)
-    project_id: str = Field(index=True)
+    project_id: str
     run_id: Optional[str] = Field(default=None, index=True)
     snapshot_id: Optional[str] = Field(default=None, index=True)
     status: str
@@ -90,8 +102,10 @@ class AgentRollback(SQLModel, table=True):
 
 
 class AgentSkill(SQLModel, table=True):
+    __table_args__ = (Index("ix_agentskill_project_created_id", "project_id", "created_at", "id"),)
+
     id: str = Field(default_factory=lambda: uuid4().hex, primary_key=True)
-    project_id: str = Field(index=True)
+    project_id: str
     name: str
     description: str
     prompt_template: Optional[str] = None
@@ -102,8 +116,10 @@ class AgentSkill(SQLModel, table=True):
 
 
 class AgentChatMessage(SQLModel, table=True):
+    __table_args__ = (Index("ix_agentchatmessage_project_created_id", "project_id", "created_at", "id"),)
+
     id: str = Field(default_factory=lambda: uuid4().hex, primary_key=True)
-    project_id: str = Field(index=True)
+    project_id: str
     role: str
     content: str
     created_at: datetime = Field(default_factory=_now)
@@ -3,7 +3,7 @@ from __future__ import annotations
 from datetime import datetime
 from enum import Enum
 from typing import Literal
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 
 
 class ProjectCreate(BaseModel):
@@ -38,6 +38,7 @@ RunType = Literal["ingest", "profile", "analysis", "report"]
 class RunCreate(BaseModel):
     dataset_id: str
     type: RunType
+    background: bool = False
 
 
 class RunRead(BaseModel):
@@ -98,6 +99,8 @@ class AgentRunRead(BaseModel):
 
 
 class AgentToolRead(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     name: str
     description: str
     destructive: bool
@@ -154,6 +157,7 @@ class AgentChatSend(BaseModel):
     dataset_id: str | None = None
     auto_run: bool = True
     safe_mode: bool = True
+    background: bool = False
 
 
 class AgentChatSendResponse(BaseModel):
@@ -206,6 +210,8 @@ class AgentSkillRead(BaseModel):
 
 
 class AgentToolRead(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     name: str
     description: str
     destructive: bool
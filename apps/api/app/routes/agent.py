@@ -1,7 +1,8 @@
 from pathlib import Path
 
-from fastapi import APIRouter, HTTPException, Response
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Response
 from fastapi.responses import FileResponse
+from pydantic import TypeAdapter
 
 from app.models.schemas import (
     AgentApproval,
@@ -28,11 +29,17 @@ from app.services import store
 
 router = APIRouter()
 
+_CHAT_MESSAGE_LIST_ADAPTER = TypeAdapter(list[AgentChatMessageRead])
+_ARTIFACT_LIST_ADAPTER = TypeAdapter(list[AgentArtifactRead])
+_SNAPSHOT_LIST_ADAPTER = TypeAdapter(list[AgentSnapshotRead])
+_ROLLBACK_LIST_ADAPTER = TypeAdapter(list[AgentRollbackRead])
+_SKILL_LIST_ADAPTER = TypeAdapter(list[AgentSkillRead])
+
 
 def _validate_toolchain(project_id: str, toolchain: list[str] | None) -> None:
     if not toolchain:
         return
-    available = {tool.name for tool in agent_service.list_tools(project_id)}
+    available = agent_service.tool_names(project_id)
     unknown = [tool for tool in toolchain if tool not in available]
     if unknown:
         raise HTTPException(
@@ -41,21 +48,39 @@ def _validate_toolchain(project_id: str, toolchain: list[str] | None) -> None:
         )
 
 
+def _set_page_headers(response: Response, total: int, next_cursor: str | None) -> None:
+    response.headers["X-Total-Count"] = str(total)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+
+
 @router.post("/runs", response_model=AgentRunRead, status_code=201)
 def create_agent_run(project_id: str, payload: AgentRunCreate) -> AgentRunRead:
-    if not store.get_project(project_id):
+    project = store.get_project(project_id)
+    if not project:
         raise HTTPException(status_code=404, detail="Project not found")
-    return agent_service.run_plan(project_id, payload.plan, payload.approvals)
+    return agent_service.run_plan(project_id, payload.plan, payload.approvals, project=project)
 
 
 @router.get("/runs", response_model=list[AgentRunRead])
 def list_agent_runs(
-    project_id: str, response: Response, limit: int = 100, offset: int = 0
+    project_id: str,
+    response: Response,
+    limit: int = 100,
+    offset: int = 0,
+    include_log: bool = True,
+    after: str | None = None,
 ) -> list[AgentRunRead]:
     if not store.get_project(project_id):
         raise HTTPException(status_code=404, detail="Project not found")
-    response.headers["X-Total-Count"] = str(agent_service.count_runs(project_id))
-    return agent_service.list_runs(project_id, limit=limit, offset=offset)
+    try:
+        runs, total, next_cursor = agent_service.list_runs_with_total(
+            project_id, limit=limit, offset=offset, include_log=include_log, after=after
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    _set_page_headers(response, total, next_cursor)
+    return runs
 
 
 @router.get("/runs/{run_id}", response_model=AgentRunRead)
@@ -92,29 +117,30 @@ def list_agent_tools(project_id: str) -> list[AgentToolRead]:
 
 @router.get("/chat/messages", response_model=list[AgentChatMessageRead])
 def list_agent_chat_messages(
-    project_id: str, response: Response, limit: int = 100, offset: int = 0
+    project_id: str,
+    response: Response,
+    limit: int = 100,
+    offset: int = 0,
+    after: str | None = None,
 ) -> list[AgentChatMessageRead]:
     if not store.get_project(project_id):
         raise HTTPException(status_code=404, detail="Project not found")
-    response.headers["X-Total-Count"] = str(agent_service.count_chat_messages(project_id))
-    messages = agent_service.list_chat_messages(project_id, limit=limit, offset=offset)
-    return [
-        AgentChatMessageRead(
-            id=message.id,
-            project_id=message.project_id,
-            role=message.role,
-            content=message.content,
-            created_at=message.created_at,
-            run_id=message.run_id,
-            attachments=message.attachments,
+    try:
+        rows, total, next_cursor = agent_service.list_chat_messages_rows(
+            project_id, limit=limit, offset=offset, after=after
         )
-        for message in messages
-    ]
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    _set_page_headers(response, total, next_cursor)
+    return _CHAT_MESSAGE_LIST_ADAPTER.validate_python(rows)
 
 
 @router.post("/chat", response_model=AgentChatSendResponse, status_code=201)
-def send_agent_chat_message(project_id: str, payload: AgentChatSend) -> AgentChatSendResponse:
-    if not store.get_project(project_id):
+def send_agent_chat_message(
+    project_id: str, payload: AgentChatSend, background_tasks: BackgroundTasks
+) -> AgentChatSendResponse:
+    project = store.get_project(project_id)
+    if not project:
         raise HTTPException(status_code=404, detail="Project not found")
     try:
         user_message, assistant_message, run = agent_service.send_chat_message(
@@ -123,9 +149,15 @@ def send_agent_chat_message(project_id: str, payload: AgentChatSend) -> AgentCha
             payload.dataset_id,
             payload.safe_mode,
             payload.auto_run,
+            payload.background,
+            project=project,
         )
     except LLMError as exc:
         raise HTTPException(status_code=503, detail=str(exc)) from exc
+    if run and payload.background:
+        background_tasks.add_task(
+            agent_service.complete_chat_run, project_id, run.id, payload.content
+        )
     return AgentChatSendResponse(
         messages=[
             AgentChatMessageRead(
@@ -159,27 +191,18 @@ def list_agent_artifacts(
     snapshot_id: str | None = None,
     limit: int = 100,
     offset: int = 0,
+    after: str | None = None,
 ) -> list[AgentArtifactRead]:
     if not store.get_project(project_id):
         raise HTTPException(status_code=404, detail="Project not found")
-    response.headers["X-Total-Count"] = str(
-        agent_service.count_agent_artifacts(project_id, run_id, snapshot_id)
-    )
-    artifacts = agent_service.list_agent_artifacts(project_id, run_id, snapshot_id, limit, offset)
-    return [
-        AgentArtifactRead(
-            id=artifact.id,
-            project_id=artifact.project_id,
-            run_id=artifact.run_id,
-            snapshot_id=artifact.snapshot_id,
-            type=artifact.type,
-            path=artifact.path,
-            mime_type=artifact.mime_type,
-            size=artifact.size,
-            created_at=artifact.created_at,
+    try:
+        rows, total, next_cursor = agent_service.list_agent_artifacts_rows(
+            project_id, run_id, snapshot_id, limit, offset, after
         )
-        for artifact in artifacts
-    ]
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    _set_page_headers(response, total, next_cursor)
+    return _ARTIFACT_LIST_ADAPTER.validate_python(rows)
 
 
 @router.get("/artifacts/{artifact_id}", response_model=AgentArtifactRead)
@@ -209,7 +232,7 @@ def download_agent_artifact(project_id: str, artifact_id: str) -> FileResponse:
     if not artifact:
         raise HTTPException(status_code=404, detail="Agent artifact not found")
     artifact_path = Path(artifact.path).resolve()
-    workspace_root = Path(project.workspace_path).resolve()
+    workspace_root = store.resolve_workspace(project.workspace_path)
     if not artifact_path.is_file() or not artifact_path.is_relative_to(workspace_root):
         raise HTTPException(status_code=404, detail="Agent artifact not found")
     return FileResponse(
@@ -221,31 +244,30 @@ def download_agent_artifact(project_id: str, artifact_id: str) -> FileResponse:
 
 @router.get("/snapshots", response_model=list[AgentSnapshotRead])
 def list_agent_snapshots(
-    project_id: str, response: Response, limit: int = 100, offset: int = 0
+    project_id: str,
+    response: Response,
+    limit: int = 100,
+    offset: int = 0,
+    after: str | None = None,
 ) -> list[AgentSnapshotRead]:
     if not store.get_project(project_id):
         raise HTTPException(status_code=404, detail="Project not found")
-    response.headers["X-Total-Count"] = str(agent_service.count_snapshots(project_id))
-    snapshots = agent_service.list_snapshots(project_id, limit=limit, offset=offset)
-    return [
-        AgentSnapshotRead(
-            id=snapshot.id,
-            project_id=snapshot.project_id,
-            run_id=snapshot.run_id,
-            kind=snapshot.kind,
-            target_path=snapshot.target_path,
-            created_at=snapshot.created_at,
-            details=snapshot.details,
+    try:
+        rows, total, next_cursor = agent_service.list_snapshots_rows(
+            project_id, limit=limit, offset=offset, after=after
         )
-        for snapshot in snapshots
-    ]
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    _set_page_headers(response, total, next_cursor)
+    return _SNAPSHOT_LIST_ADAPTER.validate_python(rows)
 
 
 @router.post("/snapshots", response_model=AgentSnapshotRead, status_code=201)
 def create_agent_snapshot(
     project_id: str, payload: AgentSnapshotCreate
 ) -> AgentSnapshotRead:
-    if not store.get_project(project_id):
+    project = store.get_project(project_id)
+    if not project:
         raise HTTPException(status_code=404, detail="Project not found")
     snapshot = agent_service.create_snapshot_record(
         project_id,
@@ -253,6 +275,7 @@ def create_agent_snapshot(
         payload.target_path,
         payload.run_id,
         payload.details,
+        project=project,
     )
     return AgentSnapshotRead(
         id=snapshot.id,
@@ -301,24 +324,22 @@ def create_agent_rollback(project_id: str, payload: AgentRollbackCreate) -> Agen
 
 @router.get("/rollbacks", response_model=list[AgentRollbackRead])
 def list_agent_rollbacks(
-    project_id: str, response: Response, limit: int = 100, offset: int = 0
+    project_id: str,
+    response: Response,
+    limit: int = 100,
+    offset: int = 0,
+    after: str | None = None,
 ) -> list[AgentRollbackRead]:
     if not store.get_project(project_id):
         raise HTTPException(status_code=404, detail="Project not found")
-    response.headers["X-Total-Count"] = str(agent_service.count_rollbacks(project_id))
-    rollbacks = agent_service.list_rollbacks(project_id, limit=limit, offset=offset)
-    return [
-        AgentRollbackRead(
-            id=rollback.id,
-            project_id=rollback.project_id,
-            run_id=rollback.run_id,
-            snapshot_id=rollback.snapshot_id,
-            status=rollback.status,
-            created_at=rollback.created_at,
-            note=rollback.note,
+    try:
+        rows, total, next_cursor = agent_service.list_rollbacks_rows(
+            project_id, limit=limit, offset=offset, after=after
         )
-        for rollback in rollbacks
-    ]
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    _set_page_headers(response, total, next_cursor)
+    return _ROLLBACK_LIST_ADAPTER.validate_python(rows)
 
 
 @router.post("/rollbacks/{rollback_id}/apply", response_model=AgentRollbackRead)
@@ -385,26 +406,22 @@ def create_agent_skill(project_id: str, payload: AgentSkillCreate) -> AgentSkill
 
 @router.get("/skills", response_model=list[AgentSkillRead])
 def list_agent_skills(
-    project_id: str, response: Response, limit: int = 100, offset: int = 0
+    project_id: str,
+    response: Response,
+    limit: int = 100,
+    offset: int = 0,
+    after: str | None = None,
 ) -> list[AgentSkillRead]:
     if not store.get_project(project_id):
         raise HTTPException(status_code=404, detail="Project not found")
-    response.headers["X-Total-Count"] = str(agent_service.count_skills(project_id))
-    skills = agent_service.list_skills(project_id, limit=limit, offset=offset)
-    return [
-        AgentSkillRead(
-            id=skill.id,
-            project_id=skill.project_id,
-            name=skill.name,
-            description=skill.description,
-            prompt_template=skill.prompt_template,
-            toolchain=skill.toolchain,
-            enabled=skill.enabled,
-            created_at=skill.created_at,
-            updated_at=skill.updated_at,
+    try:
+        rows, total, next_cursor = agent_service.list_skills_rows(
+            project_id, limit=limit, offset=offset, after=after
         )
-        for skill in skills
-    ]
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    _set_page_headers(response, total, next_cursor)
+    return _SKILL_LIST_ADAPTER.validate_python(rows)
 
 
 @router.get("/skills/{skill_id}", response_model=AgentSkillRead)
@@ -434,18 +451,18 @@ def get_agent_skill_plan(project_id: str, skill_id: str) -> AgentPlanCreate:
     skill = agent_service.get_skill(project_id, skill_id)
     if not skill:
         raise HTTPException(status_code=404, detail="Skill not found")
-    steps = []
-    for tool in skill.toolchain or []:
-        steps.append(
-            AgentPlanStepCreate(
-                title=f"Run {tool}",
-                description=skill.description,
-                tool=tool,
-                args={},
-                requires_approval=True,
-            )
+    description = skill.description
+    steps = [
+        AgentPlanStepCreate.model_construct(
+            title=f"Run {tool}",
+            description=description,
+            tool=tool,
+            args={},
+            requires_approval=True,
         )
-    return AgentPlanCreate(objective=skill.name, steps=steps)
+        for tool in skill.toolchain or []
+    ]
+    return AgentPlanCreate.model_construct(objective=skill.name, steps=steps)
 
 
 @router.patch("/skills/{skill_id}", response_model=AgentSkillRead)
@@ -59,7 +59,7 @@ def download_artifact(project_id: str, artifact_id: str) -> FileResponse:
     if not run or run.project_id != project_id:
         raise HTTPException(status_code=404, detail="Artifact not found")
     artifact_path = Path(artifact.path).resolve()
-    workspace_root = Path(project.workspace_path).resolve()
+    workspace_root = store.resolve_workspace(project.workspace_path)
     if not artifact_path.is_file() or not artifact_path.is_relative_to(workspace_root):
         raise HTTPException(status_code=404, detail="Artifact not found")
     return FileResponse(
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, HTTPException, Response
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Response
 
 from app.models.schemas import RunCreate, RunRead
 from app.services import store
@@ -7,13 +7,16 @@ router = APIRouter()
 
 
 @router.post("", response_model=RunRead, status_code=201)
-def create_run(project_id: str, payload: RunCreate) -> RunRead:
+def create_run(project_id: str, payload: RunCreate, background_tasks: BackgroundTasks) -> RunRead:
     if not store.get_project(project_id):
         raise HTTPException(status_code=404, detail="Project not found")
     dataset = store.get_dataset(payload.dataset_id)
     if not dataset or dataset.project_id != project_id:
         raise HTTPException(status_code=404, detail="Dataset not found")
-    return store.create_run(project_id, payload)
+    run = store.create_run(project_id, payload)
+    if payload.background:
+        background_tasks.add_task(store.execute_run, project_id, run.id, payload.dataset_id, payload.type)
+    return run
 
 
 @router.get("", response_model=list[RunRead])
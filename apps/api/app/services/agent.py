@@ -1,18 +1,34 @@
 from __future__ import annotations
 
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
 from dataclasses import dataclass, field
+from functools import lru_cache
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Any
+from types import MappingProxyType
+from typing import IO, Any, Callable, Iterable, Iterator, TypeVar, get_type_hints
 from uuid import uuid4
+import base64
+import inspect
 import json
+import mimetypes
+import mmap
 import os
 import re
+import shutil
+import signal
 import sqlite3
 import subprocess
+import tempfile
+import threading
 
-from sqlalchemy import func
-from sqlmodel import select
+from pydantic import BaseModel, ConfigDict, create_model
+from pydantic_core import from_json, to_json
+from sqlalchemy import delete, func, tuple_, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlmodel import Session, select
 
 from app.models.db import AgentArtifact, AgentChatMessage, AgentRun, AgentRollback, AgentSnapshot, AgentSkill
 from app.models.schemas import (
@@ -21,10 +37,48 @@ from app.models.schemas import (
     AgentRunRead,
     AgentRunStatus,
     AgentToolRead,
+    ProjectRead,
 )
 from app.services import store
 from app.services.db import get_session
-from packages.runtime.agent.llm import AgentDeps, LLMError, build_agent
+from packages.runtime.agent.llm import AgentDeps, LLMError, get_agent
+
+
+_T = TypeVar("_T")
+_R = TypeVar("_R")
+
+_BINARY_SUFFIXES = frozenset(
+    {".db", ".sqlite", ".sqlite3", ".parquet", ".png", ".jpg", ".jpeg", ".gif", ".pdf"}
+)
+_SQLITE_SUFFIXES = frozenset({".db", ".sqlite", ".sqlite3"})
+_IGNORED_DIRS = frozenset({".git", ".venv", "node_modules", "__pycache__"})
+_RIPGREP = shutil.which("rg")
+_OUTPUT_PREVIEW_BYTES = 64 * 1024
+_WRITE_CHUNK_BYTES = 1024 * 1024
+_SEARCH_WORKERS = min(8, os.cpu_count() or 1)
+_RUN_PYTHON_TIMEOUT = float(os.getenv("RUN_PYTHON_TIMEOUT", "600"))
+
+
+def _walk_entries(
+    root: Path, include_hidden: bool = False, recursive: bool = True
+) -> Iterator[os.DirEntry[str]]:
+    stack = [str(root)]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as scanner:
+                entries = list(scanner)
+        except OSError:
+            continue
+        subdirs: list[str] = []
+        for entry in entries:
+            name = entry.name
+            if not include_hidden and name.startswith("."):
+                continue
+            if entry.is_dir(follow_symlinks=False) and name not in _IGNORED_DIRS:
+                subdirs.append(entry.path)
+            yield entry
+        if recursive:
+            stack.extend(reversed(subdirs))
 
 
 def _repo_root() -> Path:
@@ -43,24 +97,35 @@ def _skill_dirs(workspace_root: Path) -> list[Path]:
 
 
 def _load_skill_files(directory: Path, max_chars: int = 4000) -> list[str]:
-    if not directory.exists() or not directory.is_dir():
+    files: list[tuple[str, int, int]] = []
+    try:
+        with os.scandir(directory) as scanner:
+            for entry in scanner:
+                if os.path.splitext(entry.name)[1].lower() not in {".md", ".txt"} or not entry.is_file():
+                    continue
+                stat = entry.stat()
+                files.append((entry.name, stat.st_mtime_ns, stat.st_size))
+    except OSError:
         return []
+    return list(_read_skill_files(str(directory), tuple(sorted(files)), max_chars))
+
+
+@lru_cache(maxsize=64)
+def _read_skill_files(
+    directory: str, signature: tuple[tuple[str, int, int], ...], max_chars: int
+) -> tuple[str, ...]:
     entries: list[str] = []
-    for path in sorted(directory.iterdir()):
-        if not path.is_file():
-            continue
-        if path.suffix.lower() not in {".md", ".txt"}:
-            continue
+    for name, _, _ in signature:
         try:
-            content = path.read_text(encoding="utf-8", errors="replace").strip()
+            content = Path(directory, name).read_text(encoding="utf-8", errors="replace").strip()
         except OSError:
             continue
         if not content:
             continue
         if len(content) > max_chars:
             content = content[:max_chars].rstrip() + "\n\n...(truncated)"
-        entries.append(f"## {path.name}\n{content}")
-    return entries
+        entries.append(f"## {name}\n{content}")
+    return tuple(entries)
 
 
 def _build_skills_context(workspace_root: Path) -> str:
@@ -86,6 +151,16 @@ class ProjectToolRuntime:
     workspace_root: Path
     run_id: str | None = None
     log: list[ToolLogEntry] = field(default_factory=list)
+    failed_count: int = field(default=0, init=False)
+    _run_log: list[dict[str, Any]] = field(default_factory=list, init=False, repr=False)
+    _db_connections: dict[Path, tuple[tuple[int, int, int] | None, sqlite3.Connection]] = field(
+        default_factory=dict, init=False, repr=False
+    )
+    _db_lock: threading.Lock = field(default_factory=threading.Lock, init=False, repr=False)
+    _default_db: Path | None = field(default=None, init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        self.workspace_root = store.resolve_workspace(str(self.workspace_root))
 
     def _resolve(self, path: str) -> Path:
         if not isinstance(path, str) or not path.strip():
@@ -95,8 +170,33 @@ class ProjectToolRuntime:
             raise ValueError("Path escapes project workspace")
         return resolved
 
+    @contextmanager
+    def _readonly_db(self, path: Path) -> Iterator[sqlite3.Connection]:
+        with self._db_lock:
+            cached = self._db_connections.pop(path, None)
+            try:
+                stat_result = path.stat()
+                key = (stat_result.st_dev, stat_result.st_ino, stat_result.st_mtime_ns)
+            except OSError:
+                key = None
+            if cached is not None and key is not None and cached[0] == key:
+                conn = cached[1]
+            else:
+                if cached is not None:
+                    cached[1].close()
+                conn = _connect_readonly(path)
+                conn.set_authorizer(_authorize_read_only)
+            self._db_connections[path] = (key, conn)
+            yield conn
+
+    def close(self) -> None:
+        with self._db_lock:
+            for _, conn in self._db_connections.values():
+                conn.close()
+            self._db_connections.clear()
+
     def _is_probably_binary(self, path: Path) -> bool:
-        if path.suffix.lower() in {".db", ".sqlite", ".sqlite3", ".parquet", ".png", ".jpg", ".jpeg", ".gif", ".pdf"}:
+        if path.suffix.lower() in _BINARY_SUFFIXES:
             return True
         try:
             with path.open("rb") as handle:
@@ -106,14 +206,23 @@ class ProjectToolRuntime:
             return False
 
     def _find_default_db(self) -> Path:
-        candidates = list(self.workspace_root.rglob("*.db"))
-        if not candidates:
-            raise ValueError("No sqlite database found; provide db_path")
-        return candidates[0]
-
-    def _record_artifact(self, path: Path, artifact_type: str, mime_type: str) -> None:
-        size = path.stat().st_size if path.exists() else 0
-        artifact = AgentArtifact(
+        if self._default_db is not None and self._default_db.is_file():
+            return self._default_db
+        for entry in _walk_entries(self.workspace_root):
+            if os.path.splitext(entry.name)[1].lower() in _SQLITE_SUFFIXES and entry.is_file():
+                self._default_db = Path(entry.path)
+                return self._default_db
+        raise ValueError("No sqlite database found; provide db_path")
+
+    def _record_artifact(
+        self, writes: list[Any], path: Path, artifact_type: str, mime_type: str
+    ) -> None:
+        try:
+            size = path.stat().st_size
+        except FileNotFoundError:
+            size = 0
+        stmt = sqlite_insert(AgentArtifact).values(
+            id=uuid4().hex,
             project_id=self.project_id,
             run_id=self.run_id,
             snapshot_id=None,
@@ -121,10 +230,17 @@ class ProjectToolRuntime:
             path=str(path),
             mime_type=mime_type,
             size=size,
+            created_at=datetime.now(timezone.utc),
         )
-        with get_session() as session:
-            session.add(artifact)
-            session.commit()
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["project_id", "run_id", "path"],
+            set_={
+                "type": stmt.excluded.type,
+                "mime_type": stmt.excluded.mime_type,
+                "size": stmt.excluded.size,
+            },
+        )
+        writes.append(stmt)
 
     def _serialize_log_entry(self, entry: ToolLogEntry) -> dict[str, Any]:
         return {
@@ -136,17 +252,21 @@ class ProjectToolRuntime:
             "created_at": entry.created_at.isoformat(),
         }
 
-    def _append_run_log(self, entry: ToolLogEntry) -> None:
-        if not self.run_id:
+    def _append_run_log(self, entry: ToolLogEntry, writes: list[Any] | None = None) -> None:
+        statements = list(writes or ())
+        if self.run_id:
+            payload = self._serialize_log_entry(entry)
+            self._run_log.append(payload)
+            statements.append(
+                update(AgentRun)
+                .where(AgentRun.id == self.run_id, AgentRun.project_id == self.project_id)
+                .values(log=func.json_insert(AgentRun.log, "$[#]", func.json(to_json(payload).decode())))
+            )
+        if not statements:
             return
-        payload = self._serialize_log_entry(entry)
         with get_session() as session:
-            run = session.get(AgentRun, self.run_id)
-            if not run or run.project_id != self.project_id:
-                return
-            existing = run.log or []
-            run.log = [*existing, payload]
-            session.add(run)
+            for statement in statements:
+                session.exec(statement)
             session.commit()
 
     def _log(
@@ -156,10 +276,13 @@ class ProjectToolRuntime:
         output: dict[str, Any],
         status: str = "applied",
         error: str | None = None,
+        writes: list[Any] | None = None,
     ) -> dict[str, Any]:
         entry = ToolLogEntry(tool=tool, args=args, output=output, status=status, error=error)
         self.log.append(entry)
-        self._append_run_log(entry)
+        if status == "failed":
+            self.failed_count += 1
+        self._append_run_log(entry, writes)
         return output
 
     def list_dir(
@@ -182,19 +305,19 @@ class ProjectToolRuntime:
         }
         try:
             root = self._resolve(safe_path)
-            if not root.exists() or not root.is_dir():
+            if not root.is_dir():
                 raise ValueError(f"Directory not found: {safe_path}")
+            base = str(root.relative_to(self.workspace_root))
+            prefix = "" if base == "." else base + os.sep
+            offset = len(str(root)) + 1
             entries: list[dict[str, Any]] = []
-            iterator = root.rglob("*") if recursive else root.iterdir()
-            for entry in iterator:
-                name = entry.name
-                if not include_hidden and name.startswith("."):
-                    continue
+            for entry in _walk_entries(root, include_hidden, recursive):
+                is_dir = entry.is_dir()
                 entries.append(
                     {
-                        "path": str(entry.relative_to(self.workspace_root)),
-                        "type": "dir" if entry.is_dir() else "file",
-                        "size": entry.stat().st_size if entry.is_file() else None,
+                        "path": prefix + entry.path[offset:],
+                        "type": "dir" if is_dir else "file",
+                        "size": entry.stat().st_size if not is_dir and entry.is_file() else None,
                     }
                 )
                 if len(entries) >= max_entries:
@@ -238,7 +361,15 @@ class ProjectToolRuntime:
             target = self._resolve(path)
             if not target.exists():
                 raise ValueError(f"File not found: {path}")
-            if self._is_probably_binary(target):
+            if start_line < 1:
+                start_line = 1
+            end = end_line or (start_line + max_lines - 1)
+            lines = (
+                None
+                if target.suffix.lower() in _BINARY_SUFFIXES
+                else _read_line_range(target, start_line, end)
+            )
+            if lines is None:
                 return self._log(
                     "read_file",
                     args,
@@ -250,17 +381,6 @@ class ProjectToolRuntime:
                     status="failed",
                     error="Binary file detected",
                 )
-            if start_line < 1:
-                start_line = 1
-            end = end_line or (start_line + max_lines - 1)
-            lines: list[str] = []
-            with target.open("r", encoding="utf-8", errors="replace") as handle:
-                for idx, line in enumerate(handle, start=1):
-                    if idx < start_line:
-                        continue
-                    if idx > end:
-                        break
-                    lines.append(line.rstrip("\n"))
             return self._log(
                 "read_file",
                 {"path": path, "start_line": start_line, "end_line": end, "max_lines": max_lines},
@@ -275,6 +395,86 @@ class ProjectToolRuntime:
                 error=str(exc),
             )
 
+    def _search_with_ripgrep(
+        self, base: Path, query: str, is_regex: bool, include_hidden: bool, max_results: int
+    ) -> list[dict[str, Any]] | None:
+        if not _RIPGREP:
+            return None
+        cmd = [_RIPGREP, "--json", "--no-config", "--no-ignore", "--no-messages", "--crlf"]
+        if not is_regex:
+            cmd.append("--fixed-strings")
+        if include_hidden:
+            cmd.append("--hidden")
+        for suffix in sorted(_BINARY_SUFFIXES):
+            cmd.extend(["--iglob", f"!*{suffix}"])
+        for name in sorted(_IGNORED_DIRS):
+            cmd.extend(["--glob", f"!{name}/"])
+        cmd.extend(["--regexp", query, "--", str(base.relative_to(self.workspace_root))])
+        results: list[dict[str, Any]] = []
+        with subprocess.Popen(
+            cmd,
+            cwd=self.workspace_root,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+        ) as proc:
+            assert proc.stdout is not None
+            for raw in proc.stdout:
+                event = from_json(raw)
+                if event.get("type") != "match":
+                    continue
+                data = event["data"]
+                results.append(
+                    {
+                        "path": _ripgrep_text(data["path"]).removeprefix("./"),
+                        "line": data["line_number"],
+                        "text": _ripgrep_text(data["lines"]).rstrip("\r\n"),
+                    }
+                )
+                if len(results) >= max_results:
+                    proc.kill()
+                    break
+        if proc.returncode == 2 and not results:
+            return None
+        return results
+
+    def _search_with_python(
+        self, base: Path, query: str, is_regex: bool, include_hidden: bool, max_results: int
+    ) -> list[dict[str, Any]]:
+        results: list[dict[str, Any]] = []
+        pattern = _compile_search_pattern(query) if is_regex or not query else None
+        needle = query.encode("utf-8") if not is_regex else b""
+        required = _required_literal(pattern) if pattern is not None else ""
+
+        def scan_literal(file_path: Path) -> list[tuple[int, str]] | None:
+            if file_path.suffix.lower() in _BINARY_SUFFIXES:
+                return None
+            return _find_literal_lines(file_path, needle, max_results)
+
+        def scan_pattern(file_path: Path) -> list[tuple[int, str]] | None:
+            if self._is_probably_binary(file_path):
+                return None
+            text = file_path.read_text(encoding="utf-8", errors="replace")
+            if required and required not in text:
+                return []
+            return _find_pattern_lines(text, pattern, max_results, required)
+
+        scan = scan_literal if needle else scan_pattern
+
+        files = (
+            Path(entry.path) for entry in _walk_entries(base, include_hidden) if not entry.is_dir()
+        )
+        with ThreadPoolExecutor(max_workers=_SEARCH_WORKERS) as pool:
+            for file_path, matches in _ordered_map(pool, scan, files, _SEARCH_WORKERS * 4):
+                if not matches:
+                    continue
+                relative = str(file_path.relative_to(self.workspace_root))
+                for idx, text in matches[: max_results - len(results)]:
+                    results.append({"path": relative, "line": idx, "text": text})
+                if len(results) >= max_results:
+                    break
+        return results
+
     def search_text(
         self,
         query: str,
@@ -292,42 +492,11 @@ class ProjectToolRuntime:
         }
         try:
             base = self._resolve(path) if path else self.workspace_root
-            results: list[dict[str, Any]] = []
-            pattern = re.compile(query) if is_regex else None
-            skipped_binary = 0
-            for file_path in base.rglob("*"):
-                if file_path.is_dir():
-                    continue
-                if not include_hidden and any(part.startswith(".") for part in file_path.parts):
-                    continue
-                if self._is_probably_binary(file_path):
-                    skipped_binary += 1
-                    continue
-                try:
-                    with file_path.open("r", encoding="utf-8", errors="replace") as handle:
-                        for idx, line in enumerate(handle, start=1):
-                            if is_regex:
-                                if pattern is None or not pattern.search(line):
-                                    continue
-                            else:
-                                if query not in line:
-                                    continue
-                            results.append(
-                                {
-                                    "path": str(file_path.relative_to(self.workspace_root)),
-                                    "line": idx,
-                                    "text": line.rstrip("\n"),
-                                }
-                            )
-                            if len(results) >= max_results:
-                                raise StopIteration
-                except StopIteration:
-                    break
-            output: dict[str, Any] = {"results": results}
-            if skipped_binary:
-                output["skipped_binary"] = skipped_binary
-                output["hint"] = "Binary files were skipped (e.g., sqlite db). Use list_db_tables/query_db instead."
-            return self._log("search_text", args, output)
+            results = self._search_with_ripgrep(base, query, is_regex, include_hidden, max_results)
+            if results is None:
+                results = self._search_with_python(base, query, is_regex, include_hidden, max_results)
+            results.sort(key=lambda item: (item["path"], item["line"]))
+            return self._log("search_text", args, {"results": results})
         except Exception as exc:
             return self._log(
                 "search_text",
@@ -341,20 +510,24 @@ class ProjectToolRuntime:
         args = {"db_path": db_path}
         try:
             target = self._resolve(db_path) if db_path else self._find_default_db()
-            conn = sqlite3.connect(target)
-            try:
+            with self._readonly_db(target) as conn:
                 cursor = conn.execute(
-                    "SELECT name FROM sqlite_master WHERE type='table' ORDER BY name"
+                    "SELECT m.name, p.name, p.type, p.\"notnull\" FROM sqlite_master AS m "
+                    "JOIN pragma_table_info(m.name) AS p WHERE m.type = 'table' "
+                    "ORDER BY m.name, p.cid"
                 )
-                tables = [row[0] for row in cursor.fetchall()]
-            finally:
-                conn.close()
+                columns: dict[str, list[dict[str, Any]]] = {}
+                for table, column, column_type, notnull in cursor:
+                    columns.setdefault(table, []).append(
+                        {"name": column, "type": column_type, "notnull": bool(notnull)}
+                    )
             return self._log(
                 "list_db_tables",
                 {"db_path": str(target)},
                 {
-                    "tables": tables,
-                    "hint": "Use query_db and PRAGMA table_info(<table>) to inspect columns.",
+                    "tables": list(columns),
+                    "columns": columns,
+                    "hint": "Columns are listed per table; use query_db to read rows.",
                 },
             )
         except Exception as exc:
@@ -368,20 +541,20 @@ class ProjectToolRuntime:
 
     def query_db(self, sql: str, db_path: str | None = None, limit: int = 200) -> dict[str, Any]:
         args = {"sql": sql, "db_path": db_path, "limit": limit}
+        target: Path | None = None
         try:
             target = self._resolve(db_path) if db_path else self._find_default_db()
-            conn = sqlite3.connect(target)
-            conn.row_factory = sqlite3.Row
-            try:
+            with self._readonly_db(target) as conn:
                 cursor = conn.execute(sql)
-                rows = cursor.fetchmany(limit)
-                output = [dict(row) for row in rows]
-            finally:
-                conn.close()
+                try:
+                    columns = [column[0] for column in cursor.description or ()]
+                    rows = cursor.fetchmany(limit)
+                finally:
+                    cursor.close()
             return self._log(
                 "query_db",
                 {"sql": sql, "db_path": str(target), "limit": limit},
-                {"rows": output},
+                {"columns": columns, "rows": rows},
             )
         except Exception as exc:
             error_text = str(exc)
@@ -389,6 +562,11 @@ class ProjectToolRuntime:
             extra: dict[str, Any] = {}
             missing_table = re.search(r"no such table: ([\w_]+)", error_text)
             missing_column = re.search(r"no such column: ([\w_]+)", error_text)
+            if "not authorized" in error_text:
+                hint = (
+                    "query_db is read-only: use SELECT statements or schema PRAGMAs. "
+                    "Use run_python to modify data."
+                )
             if missing_table:
                 table_name = missing_table.group(1)
                 hint = (
@@ -400,15 +578,15 @@ class ProjectToolRuntime:
                     if candidate.exists():
                         extra["hint_file"] = str(candidate.relative_to(self.workspace_root))
                         break
-                try:
-                    conn = sqlite3.connect(self._resolve(db_path) if db_path else self._find_default_db())
-                    cursor = conn.execute(
-                        "SELECT name FROM sqlite_master WHERE type='table' ORDER BY name"
-                    )
-                    extra["available_tables"] = [row[0] for row in cursor.fetchall()]
-                    conn.close()
-                except Exception:
-                    pass
+                if target is not None:
+                    try:
+                        with self._readonly_db(target) as conn:
+                            cursor = conn.execute(
+                                "SELECT name FROM sqlite_master WHERE type='table' ORDER BY name"
+                            )
+                            extra["available_tables"] = [row[0] for row in cursor.fetchall()]
+                    except Exception:
+                        pass
             if missing_column:
                 column_name = missing_column.group(1)
                 table_match = re.search(r"from\s+([\w_]+)", sql, flags=re.IGNORECASE)
@@ -416,13 +594,12 @@ class ProjectToolRuntime:
                     "Column not found. Use PRAGMA table_info(<table>) to inspect columns "
                     "and update the query."
                 )
-                if table_match:
+                if table_match and target is not None:
                     table_name = table_match.group(1)
                     try:
-                        conn = sqlite3.connect(self._resolve(db_path) if db_path else self._find_default_db())
-                        cursor = conn.execute(f"PRAGMA table_info({table_name})")
-                        extra["available_columns"] = [row[1] for row in cursor.fetchall()]
-                        conn.close()
+                        with self._readonly_db(target) as conn:
+                            cursor = conn.execute(f"PRAGMA table_info({table_name})")
+                            extra["available_columns"] = [row[1] for row in cursor.fetchall()]
                     except Exception:
                         pass
                 extra["missing_column"] = column_name
@@ -440,12 +617,17 @@ class ProjectToolRuntime:
 
     def write_file(self, path: str, content: str) -> dict[str, Any]:
         args = {"path": path}
+        writes: list[Any] = []
         try:
             target = self._resolve(path)
-            target.parent.mkdir(parents=True, exist_ok=True)
-            target.write_text(content, encoding="utf-8")
-            self._record_artifact(target, "text_file", "text/plain")
-            return self._log("write_file", args, {"path": path, "bytes": len(content)})
+            _atomic_write(target, content.encode("utf-8"))
+            self._record_artifact(writes, target, "text_file", "text/plain")
+            return self._log(
+                "write_file",
+                args,
+                {"path": path, "bytes": len(content)},
+                writes=writes,
+            )
         except Exception as exc:
             return self._log(
                 "write_file",
@@ -453,10 +635,12 @@ class ProjectToolRuntime:
                 {"error": str(exc)},
                 status="failed",
                 error=str(exc),
+                writes=writes,
             )
 
     def write_markdown(self, path: str, content: str, results_path: str | None = None) -> dict[str, Any]:
         args = {"path": path, "results_path": results_path}
+        writes: list[Any] = []
         try:
             has_placeholders = bool(_RESULT_PLACEHOLDER.search(content))
             if has_placeholders and not results_path:
@@ -465,18 +649,18 @@ class ProjectToolRuntime:
                 resolved_results = self._resolve(results_path)
                 if not resolved_results.is_file():
                     raise ValueError(f"Results file not found: {results_path}")
-                payload = json.loads(resolved_results.read_text(encoding="utf-8", errors="replace"))
+                payload = from_json(resolved_results.read_text(encoding="utf-8", errors="replace"))
                 if not isinstance(payload, dict):
                     raise ValueError("Results file must contain a JSON object")
                 content = _fill_results_placeholders(content, payload)
             target = self._resolve(path)
-            target.parent.mkdir(parents=True, exist_ok=True)
-            target.write_text(content, encoding="utf-8")
-            self._record_artifact(target, "markdown", "text/markdown")
+            _atomic_write(target, content.encode("utf-8"))
+            self._record_artifact(writes, target, "markdown", "text/markdown")
             return self._log(
                 "write_markdown",
                 args,
                 {"path": path, "bytes": len(content)},
+                writes=writes,
             )
         except Exception as exc:
             return self._log(
@@ -485,10 +669,12 @@ class ProjectToolRuntime:
                 {"error": str(exc)},
                 status="failed",
                 error=str(exc),
+                writes=writes,
             )
 
     def run_python(self, code: str | None = None, path: str | None = None) -> dict[str, Any]:
         args = {"code": code, "path": path}
+        writes: list[Any] = []
         try:
             if not code and not path:
                 raise ValueError("run_python requires code or path")
@@ -505,11 +691,12 @@ class ProjectToolRuntime:
                         },
                         status="failed",
                         error="Invalid run_python path",
+                        writes=writes,
                     )
                 if code is not None:
                     target.parent.mkdir(parents=True, exist_ok=True)
                     target.write_text(code, encoding="utf-8")
-                    self._record_artifact(target, "text_file", "text/plain")
+                    self._record_artifact(writes, target, "text_file", "text/plain")
                     source = code
                 else:
                     if not target.exists():
@@ -527,7 +714,7 @@ class ProjectToolRuntime:
                 )
                 source = code or ""
                 target.write_text(prefix + source, encoding="utf-8")
-                self._record_artifact(target, "text_file", "text/plain")
+                self._record_artifact(writes, target, "text_file", "text/plain")
             missing_inputs = _script_missing_inputs(source, self.workspace_root)
             if missing_inputs:
                 missing_text = ", ".join(missing_inputs)
@@ -542,6 +729,7 @@ class ProjectToolRuntime:
                     },
                     status="failed",
                     error=f"Missing input files for run_python: {missing_text}",
+                    writes=writes,
                 )
             if not _script_reads_data(source) and _script_looks_hardcoded(source):
                 return self._log(
@@ -553,6 +741,7 @@ class ProjectToolRuntime:
                     },
                     status="failed",
                     error="Script must load workspace data; hard-coded arrays are not allowed.",
+                    writes=writes,
                 )
             if "results.json" in source and not _script_reads_data(source):
                 return self._log(
@@ -565,30 +754,57 @@ class ProjectToolRuntime:
                     },
                     status="failed",
                     error="Results must be derived from workspace data sources.",
+                    writes=writes,
                 )
-            cmd = ["uv", "run", "python", str(target.relative_to(self.workspace_root))]
+            script = str(target.relative_to(self.workspace_root))
+            try:
+                cmd = [_project_python(str(self.workspace_root)), script]
+            except (OSError, RuntimeError, subprocess.SubprocessError):
+                cmd = ["uv", "run", "python", script]
             env = os.environ.copy()
             env["PROJECT_ROOT"] = str(self.workspace_root)
-            proc = subprocess.run(
-                cmd,
-                cwd=self.workspace_root,
-                capture_output=True,
-                text=True,
-                env=env,
-            )
             output_path = self._resolve(f"artifacts/agent/agent-python-{uuid4().hex}.txt")
             output_path.parent.mkdir(parents=True, exist_ok=True)
-            output_path.write_text(proc.stdout + proc.stderr, encoding="utf-8")
-            self._record_artifact(output_path, "python_run_output", "text/plain")
+            with output_path.open("w+b") as output, tempfile.TemporaryFile() as errors:
+                exit_code, timed_out = _run_bounded(
+                    cmd,
+                    cwd=self.workspace_root,
+                    env=env,
+                    stdout=output,
+                    stderr=errors,
+                    timeout=_RUN_PYTHON_TIMEOUT,
+                )
+                stdout_size = output.tell()
+                errors.seek(0)
+                shutil.copyfileobj(errors, output)
+                total_size = output.tell()
+                stdout = _read_tail(output, 0, stdout_size)
+                stderr = _read_tail(output, stdout_size, total_size)
+            self._record_artifact(writes, output_path, "python_run_output", "text/plain")
+            result: dict[str, Any] = {
+                "path": str(target.relative_to(self.workspace_root)),
+                "exit_code": exit_code,
+                "stdout": stdout,
+                "stderr": stderr,
+            }
+            if max(stdout_size, total_size - stdout_size) > _OUTPUT_PREVIEW_BYTES:
+                result["output_path"] = str(output_path.relative_to(self.workspace_root))
+            if timed_out:
+                error = f"Script timed out after {_RUN_PYTHON_TIMEOUT:g} seconds"
+                result["error"] = error
+                return self._log(
+                    "run_python",
+                    {"path": str(target.relative_to(self.workspace_root))},
+                    result,
+                    status="failed",
+                    error=error,
+                    writes=writes,
+                )
             return self._log(
                 "run_python",
                 {"path": str(target.relative_to(self.workspace_root))},
-                {
-                    "path": str(target.relative_to(self.workspace_root)),
-                    "exit_code": proc.returncode,
-                    "stdout": proc.stdout,
-                    "stderr": proc.stderr,
-                },
+                result,
+                writes=writes,
             )
         except Exception as exc:
             return self._log(
@@ -597,49 +813,277 @@ class ProjectToolRuntime:
                 {"error": str(exc)},
                 status="failed",
                 error=str(exc),
+                writes=writes,
             )
 
 
+def _run_bounded(
+    cmd: list[str],
+    *,
+    cwd: Path,
+    env: dict[str, str],
+    stdout: IO[bytes],
+    stderr: IO[bytes],
+    timeout: float,
+) -> tuple[int, bool]:
+    with subprocess.Popen(
+        cmd,
+        cwd=cwd,
+        env=env,
+        stdin=subprocess.DEVNULL,
+        stdout=stdout,
+        stderr=stderr,
+        start_new_session=True,
+    ) as proc:
+        try:
+            return proc.wait(timeout=timeout), False
+        except subprocess.TimeoutExpired:
+            try:
+                os.killpg(proc.pid, signal.SIGKILL)
+            except (AttributeError, ProcessLookupError):
+                proc.kill()
+            return proc.wait(), True
+
+
+@lru_cache(maxsize=32)
+def _project_python(cwd: str) -> str:
+    proc = subprocess.run(
+        ["uv", "run", "python", "-c", "import sys; print(sys.executable)"],
+        cwd=cwd,
+        stdin=subprocess.DEVNULL,
+        capture_output=True,
+        text=True,
+        timeout=300,
+    )
+    executable = proc.stdout.strip()
+    if proc.returncode != 0 or not executable:
+        raise RuntimeError("Could not resolve the project interpreter")
+    return executable
+
+
+def _atomic_write(path: Path, data: bytes) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temp_path = path.with_name(f".{path.name}.{uuid4().hex}.tmp")
+    fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+    try:
+        view = memoryview(data)
+        while view:
+            view = view[os.write(fd, view[:_WRITE_CHUNK_BYTES]) :]
+        os.fsync(fd)
+    except BaseException:
+        os.close(fd)
+        temp_path.unlink(missing_ok=True)
+        raise
+    os.close(fd)
+    try:
+        if path.exists():
+            shutil.copymode(path, temp_path)
+        os.replace(temp_path, path)
+    except BaseException:
+        temp_path.unlink(missing_ok=True)
+        raise
+
+
+def _ordered_map(
+    pool: ThreadPoolExecutor, fn: Callable[[_T], _R], items: Iterable[_T], window: int
+) -> Iterator[tuple[_T, _R]]:
+    pending: deque[tuple[_T, Future[_R]]] = deque()
+    try:
+        for item in items:
+            pending.append((item, pool.submit(fn, item)))
+            if len(pending) >= window:
+                item, future = pending.popleft()
+                yield item, future.result()
+        while pending:
+            item, future = pending.popleft()
+            yield item, future.result()
+    finally:
+        for _, future in pending:
+            future.cancel()
+
+
+def _read_tail(handle: IO[bytes], start: int, stop: int) -> str:
+    handle.seek(max(start, stop - _OUTPUT_PREVIEW_BYTES))
+    return handle.read(stop - handle.tell()).decode("utf-8", errors="replace")
+
+
+@contextmanager
+def _mapped_bytes(path: Path) -> Iterator[bytes | mmap.mmap]:
+    with path.open("rb") as handle:
+        if os.fstat(handle.fileno()).st_size < mmap.PAGESIZE:
+            yield handle.read()
+            return
+        with mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            if hasattr(mmap, "MADV_SEQUENTIAL"):
+                mapped.madvise(mmap.MADV_SEQUENTIAL)
+            yield mapped
+
+
+def _decode_line(data: bytes | mmap.mmap, start: int, stop: int) -> str:
+    return data[start:stop].decode("utf-8", errors="replace").rstrip("\r")
+
+
+def _read_line_range(path: Path, start_line: int, end_line: int) -> list[str] | None:
+    lines: list[str] = []
+    with _mapped_bytes(path) as data:
+        if b"\x00" in data[:1024]:
+            return None
+        size = len(data)
+        pos = 0
+        idx = 1
+        while pos < size and idx <= end_line:
+            newline = data.find(b"\n", pos)
+            stop = size if newline == -1 else newline
+            if idx >= start_line:
+                lines.append(_decode_line(data, pos, stop))
+            pos = stop + 1
+            idx += 1
+    return lines
+
+
+def _find_literal_lines(path: Path, needle: bytes, limit: int) -> list[tuple[int, str]] | None:
+    matches: list[tuple[int, str]] = []
+    with _mapped_bytes(path) as data:
+        if b"\x00" in data[:1024]:
+            return None
+        size = len(data)
+        line_no = 1
+        counted = 0
+        pos = data.find(needle)
+        while pos != -1 and len(matches) < limit:
+            line_start = data.rfind(b"\n", 0, pos) + 1
+            line_end = data.find(b"\n", pos)
+            if line_end == -1:
+                line_end = size
+            line_no += data[counted:line_start].count(b"\n")
+            counted = line_start
+            matches.append((line_no, _decode_line(data, line_start, line_end)))
+            if line_end >= size:
+                break
+            pos = data.find(needle, line_end + 1)
+    return matches
+
+
+_READ_ONLY_ACTIONS = frozenset(
+    {sqlite3.SQLITE_SELECT, sqlite3.SQLITE_READ, sqlite3.SQLITE_FUNCTION, sqlite3.SQLITE_RECURSIVE}
+)
+_READ_ONLY_PRAGMAS = frozenset(
+    {
+        "table_info",
+        "table_xinfo",
+        "table_list",
+        "index_list",
+        "index_info",
+        "index_xinfo",
+        "foreign_key_list",
+        "database_list",
+        "collation_list",
+    }
+)
+
+
+def _authorize_read_only(
+    action: int, arg1: str | None, arg2: str | None, db_name: str | None, source: str | None
+) -> int:
+    if action in _READ_ONLY_ACTIONS:
+        return sqlite3.SQLITE_OK
+    if action == sqlite3.SQLITE_PRAGMA and arg1 in _READ_ONLY_PRAGMAS:
+        return sqlite3.SQLITE_OK
+    # Table-valued pragmas (pragma_table_info) ask for this; SQLite itself
+    # refuses real sqlite_master writes without writable_schema.
+    if action == sqlite3.SQLITE_UPDATE and arg1 == "sqlite_master":
+        return sqlite3.SQLITE_OK
+    return sqlite3.SQLITE_DENY
+
+
+def _connect_readonly(path: Path) -> sqlite3.Connection:
+    conn = sqlite3.connect(f"{path.resolve().as_uri()}?mode=ro", uri=True, check_same_thread=False)
+    conn.execute("PRAGMA query_only = 1")
+    conn.execute("PRAGMA cache_size = -65536")
+    conn.execute("PRAGMA temp_store = MEMORY")
+    conn.execute("PRAGMA mmap_size = 268435456")
+    return conn
+
+
+_REGEX_METACHARACTERS = frozenset(".^$*+?{}[]()|\\")
+
+
+@lru_cache(maxsize=128)
+def _compile_search_pattern(query: str) -> re.Pattern[str]:
+    return re.compile(query, re.MULTILINE)
+
+
+def _required_literal(pattern: re.Pattern[str]) -> str:
+    if pattern.flags & re.IGNORECASE or _REGEX_METACHARACTERS.intersection(pattern.pattern):
+        return ""
+    return pattern.pattern
+
+
+def _find_pattern_lines(
+    text: str, pattern: re.Pattern[str], limit: int, required: str = ""
+) -> list[tuple[int, str]]:
+    matches: list[tuple[int, str]] = []
+    size = len(text)
+    pos = 0
+    line_no = 1
+    while pos < size and len(matches) < limit:
+        if required:
+            hit = text.find(required, pos)
+            if hit == -1:
+                break
+            skipped = text.rfind("\n", pos, hit)
+            if skipped != -1:
+                line_no += text.count("\n", pos, skipped + 1)
+                pos = skipped + 1
+        line_end = text.find("\n", pos)
+        if line_end == -1:
+            line_end = size
+        if pattern.search(text, pos, line_end):
+            matches.append((line_no, text[pos:line_end]))
+        pos = line_end + 1
+        line_no += 1
+    return matches
+
+
+def _ripgrep_text(value: dict[str, Any]) -> str:
+    if "text" in value:
+        return value["text"]
+    return base64.b64decode(value.get("bytes", "")).decode("utf-8", errors="replace")
+
+
+_DATA_READ_PATTERN = re.compile(
+    r"\bopen\(|(?:pandas|pd)\.read_|sqlite3\.connect\(|json\.load\(|csv\.reader\("
+)
+_INLINE_ARRAY_PATTERN = re.compile(r"=\s*\[[^\]]{80,}\]", re.DOTALL)
+_NUMBER_PATTERN = re.compile(r"\b\d+(?:\.\d+)?\b")
+
+
 def _script_reads_data(source: str) -> bool:
-    patterns = [
-        r"\bopen\(",
-        r"pandas\.read_",
-        r"pd\.read_",
-        r"pandas\.read_sql",
-        r"pd\.read_sql",
-        r"pandas\.read_sql_query",
-        r"pd\.read_sql_query",
-        r"sqlite3\.connect\(",
-        r"json\.load\(",
-        r"csv\.reader\(",
-    ]
-    return any(re.search(pat, source) for pat in patterns)
+    return _DATA_READ_PATTERN.search(source) is not None
 
 
 def _script_looks_hardcoded(source: str) -> bool:
-    if re.search(r"=\s*\[[^\]]{80,}\]", source, flags=re.DOTALL):
+    if _INLINE_ARRAY_PATTERN.search(source):
         return True
-    numbers = re.findall(r"\b\d+(?:\.\d+)?\b", source)
-    return len(numbers) >= 12
+    count = 0
+    for _ in _NUMBER_PATTERN.finditer(source):
+        count += 1
+        if count >= 12:
+            return True
+    return False
+
+
+_FILE_READ_PATTERN = re.compile(
+    r"(?:(?:pandas|pd)\.read_(?:csv|json|parquet|excel|table)|sqlite3\.connect)\(\s*['\"]([^'\"]+)['\"]"
+)
+_OPEN_PATTERN = re.compile(r"\bopen\(\s*['\"]([^'\"]+)['\"](?:\s*,\s*['\"]([^'\"]+)['\"])?")
 
 
 def _script_missing_inputs(source: str, workspace_root: Path) -> list[str]:
     missing: list[str] = []
-    file_read_patterns = [
-        r"(?:pandas|pd)\.read_csv\(\s*['\"]([^'\"]+)['\"]",
-        r"(?:pandas|pd)\.read_json\(\s*['\"]([^'\"]+)['\"]",
-        r"(?:pandas|pd)\.read_parquet\(\s*['\"]([^'\"]+)['\"]",
-        r"(?:pandas|pd)\.read_excel\(\s*['\"]([^'\"]+)['\"]",
-        r"(?:pandas|pd)\.read_table\(\s*['\"]([^'\"]+)['\"]",
-        r"sqlite3\.connect\(\s*['\"]([^'\"]+)['\"]",
-    ]
-    open_pattern = r"\bopen\(\s*['\"]([^'\"]+)['\"](?:\s*,\s*['\"]([^'\"]+)['\"])?"
-
-    candidates: list[str] = []
-    for pattern in file_read_patterns:
-        candidates.extend(re.findall(pattern, source))
+    candidates: list[str] = _FILE_READ_PATTERN.findall(source)
 
-    for raw_path, mode in re.findall(open_pattern, source):
+    for raw_path, mode in _OPEN_PATTERN.findall(source):
         mode_value = (mode or "r").lower()
         if any(flag in mode_value for flag in ("w", "a", "x", "+")) and "r" not in mode_value:
             continue
@@ -680,7 +1124,7 @@ def _fill_results_placeholders(content: str, results: dict[str, Any]) -> str:
     return filled
 
 
-_TOOL_SPECS: list[AgentToolRead] = [
+_TOOL_SPECS: tuple[AgentToolRead, ...] = (
     AgentToolRead(
         name="list_dir",
         description="List files and folders. Start from project root '.' when unsure.",
@@ -698,7 +1142,7 @@ _TOOL_SPECS: list[AgentToolRead] = [
     ),
     AgentToolRead(
         name="list_db_tables",
-        description="List tables in a sqlite database (default: first .db in project).",
+        description="List tables in a sqlite database (default: first .db/.sqlite file in project).",
         destructive=False,
     ),
     AgentToolRead(
@@ -722,19 +1166,39 @@ _TOOL_SPECS: list[AgentToolRead] = [
         ),
         destructive=True,
     ),
-]
+)
+_TOOL_NAMES = frozenset(tool.name for tool in _TOOL_SPECS)
+_TOOL_HANDLERS = MappingProxyType({name: getattr(ProjectToolRuntime, name) for name in _TOOL_NAMES})
+
+
+def _tool_args_model(name: str) -> type[BaseModel]:
+    handler = _TOOL_HANDLERS[name]
+    hints = get_type_hints(handler)
+    fields: dict[str, Any] = {}
+    for param in list(inspect.signature(handler).parameters.values())[1:]:
+        default = ... if param.default is inspect.Parameter.empty else param.default
+        fields[param.name] = (hints[param.name], default)
+    return create_model(f"{name}_args", __config__=ConfigDict(extra="forbid"), **fields)
+
+
+_TOOL_ARG_MODELS = MappingProxyType({name: _tool_args_model(name) for name in _TOOL_NAMES})
 
 
 def list_tools(project_id: str) -> list[AgentToolRead]:
-    return _TOOL_SPECS
+    return list(_TOOL_SPECS)
+
+
+def tool_names(project_id: str) -> frozenset[str]:
+    return _TOOL_NAMES
 
 
 def _create_chat_message(project_id: str, role: str, content: str, run_id: str | None = None) -> AgentChatMessage:
     message = AgentChatMessage(project_id=project_id, role=role, content=content, run_id=run_id)
     with get_session() as session:
         session.add(message)
+        session.flush()
+        session.expunge(message)
         session.commit()
-        session.refresh(message)
     return message
 
 
@@ -748,39 +1212,36 @@ def _summarize_tool_log(log: list[ToolLogEntry], max_items: int = 6) -> str:
     return "\n".join(lines)
 
 
-def send_chat_message(
-    project_id: str,
-    content: str,
-    dataset_id: str | None,
-    safe_mode: bool,
-    auto_run: bool,
-) -> tuple[AgentChatMessage, AgentChatMessage, AgentRunRead | None]:
-    user_message = _create_chat_message(project_id, "user", content)
-    assistant_content = "Saved your note."
-    run_read: AgentRunRead | None = None
+_CHAT_RUN_PLAN = AgentPlanCreate(objective="PydanticAI autonomous run", steps=[])
 
-    if auto_run:
-        project = store.get_project(project_id)
-        if not project:
-            raise ValueError("Project not found")
-        plan = AgentPlanCreate(objective="PydanticAI autonomous run", steps=[])
-        run = AgentRun(
-            project_id=project_id,
-            status=AgentRunStatus.PENDING.value,
-            plan=plan.model_dump(mode="json"),
-            log=[],
-        )
-        with get_session() as session:
-            session.add(run)
-            session.commit()
-            session.refresh(run)
-        tools = ProjectToolRuntime(
-            project_id=project_id,
-            workspace_root=Path(project.workspace_path),
-            run_id=run.id,
-        )
+
+def _create_chat_run(project_id: str) -> AgentRun:
+    run = AgentRun(
+        project_id=project_id,
+        status=AgentRunStatus.PENDING.value,
+        plan=_CHAT_RUN_PLAN.model_dump(),
+        log=[],
+    )
+    with get_session() as session:
+        session.add(run)
+        session.flush()
+        session.expunge(run)
+        session.commit()
+    return run
+
+
+def _execute_chat_run(
+    project_id: str, run_id: str, workspace_root: Path, content: str
+) -> tuple[str, list[dict[str, Any]]]:
+    tools = ProjectToolRuntime(
+        project_id=project_id,
+        workspace_root=workspace_root,
+        run_id=run_id,
+    )
+    status = AgentRunStatus.FAILED
+    try:
         skills_context = _build_skills_context(tools.workspace_root)
-        agent = build_agent(extra_instructions=skills_context or None)
+        agent = get_agent(extra_instructions=skills_context or None)
         root_entries: list[str] = []
         try:
             for entry in tools.workspace_root.iterdir():
@@ -798,77 +1259,124 @@ def send_chat_message(
         result = None
         retry_context = ""
         max_attempts = 3
+        for attempt in range(max_attempts):
+            try:
+                result = agent.run_sync(
+                    augmented_content + retry_context, deps=AgentDeps(tools=tools)
+                )
+                break
+            except Exception as exc:
+                error_text = str(exc)
+                if attempt >= max_attempts - 1:
+                    raise LLMError(error_text) from exc
+                summary = _summarize_tool_log(tools.log)
+                retry_context = (
+                    "\n\nPrevious attempt failed with tool errors. "
+                    "Review the tool log summary and retry with corrected tool usage.\n"
+                    f"Error: {error_text}\n"
+                    f"Recent tool log:\n{summary}\n"
+                )
+        if result is None:
+            raise LLMError("Agent failed without producing a result")
         status = AgentRunStatus.COMPLETED
-        try:
-            for attempt in range(max_attempts):
-                try:
-                    result = agent.run_sync(
-                        augmented_content + retry_context, deps=AgentDeps(tools=tools)
-                    )
-                    break
-                except Exception as exc:
-                    error_text = str(exc)
-                    if attempt >= max_attempts - 1:
-                        raise LLMError(error_text) from exc
-                    summary = _summarize_tool_log(tools.log)
-                    retry_context = (
-                        "\n\nPrevious attempt failed with tool errors. "
-                        "Review the tool log summary and retry with corrected tool usage.\n"
-                        f"Error: {error_text}\n"
-                        f"Recent tool log:\n{summary}\n"
-                    )
-            if result is None:
-                raise LLMError("Agent failed without producing a result")
-            assistant_content = result.output
-        except LLMError:
-            status = AgentRunStatus.FAILED
-            raise
-        finally:
-            log = [tools._serialize_log_entry(entry) for entry in tools.log]
-            with get_session() as session:
-                run_db = session.get(AgentRun, run.id)
-                if run_db:
-                    run_db.status = status.value
-                    run_db.plan = plan.model_dump(mode="json")
-                    run_db.log = log
-                    session.add(run_db)
-                    session.commit()
-                    session.refresh(run_db)
-
-        run_read = AgentRunRead(
-            id=run.id,
-            project_id=run.project_id,
-            status=status,
-            plan=plan,
-            log=log,
-        )
+    finally:
+        tools.close()
+        log = list(tools._run_log)
+        with get_session() as session:
+            session.exec(
+                update(AgentRun)
+                .where(AgentRun.id == run_id)
+                .values(status=status.value, log=log)
+            )
+            session.commit()
+    return result.output, log
+
+
+def send_chat_message(
+    project_id: str,
+    content: str,
+    dataset_id: str | None,
+    safe_mode: bool,
+    auto_run: bool,
+    background: bool = False,
+    project: ProjectRead | None = None,
+) -> tuple[AgentChatMessage, AgentChatMessage, AgentRunRead | None]:
+    user_message = _create_chat_message(project_id, "user", content)
+
+    if auto_run:
+        project = project or store.get_project(project_id)
+        if not project:
+            raise ValueError("Project not found")
+        run = _create_chat_run(project_id)
+        if background:
+            assistant_content = f"Started run {run.id}."
+            run_read = AgentRunRead.model_construct(
+                id=run.id,
+                project_id=project_id,
+                status=AgentRunStatus.PENDING,
+                plan=_CHAT_RUN_PLAN,
+                log=[],
+            )
+        else:
+            assistant_content, log = _execute_chat_run(
+                project_id, run.id, Path(project.workspace_path), content
+            )
+            run_read = AgentRunRead.model_construct(
+                id=run.id,
+                project_id=project_id,
+                status=AgentRunStatus.COMPLETED,
+                plan=_CHAT_RUN_PLAN,
+                log=log,
+            )
         assistant_message = _create_chat_message(
             project_id, "assistant", assistant_content, run_id=run.id
         )
         return user_message, assistant_message, run_read
 
-    assistant_message = _create_chat_message(project_id, "assistant", assistant_content)
-    return user_message, assistant_message, run_read
+    assistant_message = _create_chat_message(project_id, "assistant", "Saved your note.")
+    return user_message, assistant_message, None
+
+
+def complete_chat_run(project_id: str, run_id: str, content: str) -> None:
+    project = store.get_project(project_id)
+    if not project:
+        return
+    try:
+        assistant_content, _ = _execute_chat_run(
+            project_id, run_id, Path(project.workspace_path), content
+        )
+    except Exception as exc:
+        with get_session() as session:
+            session.exec(
+                update(AgentRun)
+                .where(AgentRun.id == run_id, AgentRun.project_id == project_id)
+                .values(status=AgentRunStatus.FAILED.value)
+            )
+            session.commit()
+        assistant_content = f"Run {run_id} failed: {exc}"
+    _create_chat_message(project_id, "assistant", assistant_content, run_id=run_id)
 
 
 def run_plan(
     project_id: str,
     plan: AgentPlanCreate,
     approvals: dict[str, AgentApproval] | None,
+    project: ProjectRead | None = None,
 ) -> AgentRunRead:
-    project = store.get_project(project_id)
+    project = project or store.get_project(project_id)
     if not project:
         raise ValueError("Project not found")
     run = AgentRun(
         project_id=project_id,
         status=AgentRunStatus.PENDING.value,
-        plan=plan.model_dump(mode="json"),
+        plan=plan.model_dump(),
         log=[],
     )
     with get_session() as session:
         session.add(run)
+        session.flush()
+        session.expunge(run)
         session.commit()
-        session.refresh(run)
     tools = ProjectToolRuntime(
         project_id=project_id,
         workspace_root=Path(project.workspace_path),
@@ -879,42 +1387,27 @@ def run_plan(
         tool_name = step.tool
         args = step.args or {}
         try:
-            if tool_name == "list_dir":
-                tools.list_dir(**args)
-            elif tool_name == "read_file":
-                tools.read_file(**args)
-            elif tool_name == "search_text":
-                tools.search_text(**args)
-            elif tool_name == "list_db_tables":
-                tools.list_db_tables(**args)
-            elif tool_name == "query_db":
-                tools.query_db(**args)
-            elif tool_name == "write_file":
-                tools.write_file(**args)
-            elif tool_name == "write_markdown":
-                tools.write_markdown(**args)
-            elif tool_name == "run_python":
-                tools.run_python(**args)
-            else:
+            handler = _TOOL_HANDLERS.get(tool_name)
+            if handler is None:
                 raise ValueError(f"Unknown tool: {tool_name}")
+            handler(tools, **dict(_TOOL_ARG_MODELS[tool_name].model_validate(args)))
         except Exception:
             status = AgentRunStatus.FAILED
             break
-        if any(entry.status == "failed" for entry in tools.log):
+        if tools.failed_count:
             status = AgentRunStatus.FAILED
             break
 
-    log = [tools._serialize_log_entry(entry) for entry in tools.log]
+    tools.close()
+    log = list(tools._run_log)
     with get_session() as session:
-        run_db = session.get(AgentRun, run.id)
-        if run_db:
-            run_db.status = status.value
-            run_db.plan = plan.model_dump(mode="json")
-            run_db.log = log
-            session.add(run_db)
-            session.commit()
-            session.refresh(run_db)
-    return AgentRunRead(
+        session.exec(
+            update(AgentRun)
+            .where(AgentRun.id == run.id)
+            .values(status=status.value, log=log)
+        )
+        session.commit()
+    return AgentRunRead.model_construct(
         id=run.id,
         project_id=run.project_id,
         status=status,
@@ -929,32 +1422,141 @@ def apply_run_step(
     raise ValueError("Step approvals are not supported in the new agent")
 
 
-def list_runs(project_id: str, limit: int = 100, offset: int = 0) -> list[AgentRunRead]:
-    with get_session() as session:
-        results = list(session.exec(
-            select(AgentRun)
-            .where(AgentRun.project_id == project_id)
-            .limit(limit)
-            .offset(offset)
-        ))
+def _agent_run_read(run: AgentRun, include_log: bool = True) -> AgentRunRead:
+    return AgentRunRead.model_construct(
+        id=run.id,
+        project_id=run.project_id,
+        status=AgentRunStatus(run.status),
+        plan=_normalize_plan(run.plan),
+        log=(run.log or []) if include_log else [],
+    )
+
+
+def _encode_cursor(created_at: datetime, row_id: str) -> str:
+    raw = f"{created_at.isoformat()}|{row_id}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def _decode_cursor(cursor: str) -> tuple[datetime, str]:
+    try:
+        created_at, row_id = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").split("|", 1)
+        return datetime.fromisoformat(created_at), row_id
+    except (ValueError, UnicodeError) as exc:
+        raise ValueError("Invalid cursor") from exc
+
+
+def _page_query(
+    query: Any,
+    model: Any,
+    project_id: str,
+    limit: int,
+    offset: int,
+    after: str | None,
+    filters: tuple[Any, ...] = (),
+) -> Any:
+    query = query.where(model.project_id == project_id, *filters)
+    if after:
+        created_at, row_id = _decode_cursor(after)
+        query = query.where(tuple_(model.created_at, model.id) > tuple_(created_at, row_id))
+    return query.order_by(model.created_at, model.id).offset(offset).limit(limit)
+
+
+def _page_total(
+    session: Session,
+    model: Any,
+    project_id: str,
+    page_total: int | None,
+    offset: int,
+    after: str | None,
+    filters: tuple[Any, ...] = (),
+) -> int:
+    if page_total is not None and not after:
+        return page_total
+    if page_total is None and offset <= 0 and not after:
+        return 0
+    return session.scalar(
+        select(func.count(model.id)).where(model.project_id == project_id, *filters)
+    ) or 0
+
+
+def _list_rows_with_total(
+    session: Session,
+    model: Any,
+    project_id: str,
+    limit: int,
+    offset: int,
+    after: str | None = None,
+    columns: tuple[Any, ...] = (),
+    filters: tuple[Any, ...] = (),
+) -> tuple[list[dict[str, Any]], int, str | None]:
+    rows = session.exec(
+        _page_query(
+            select(*(columns or model.__table__.columns), func.count().over().label("total")),
+            model,
+            project_id,
+            limit,
+            offset,
+            after,
+            filters,
+        )
+    ).mappings().all()
+    items = [{key: value for key, value in row.items() if key != "total"} for row in rows]
+    total = _page_total(
+        session, model, project_id, int(rows[0]["total"]) if rows else None, offset, after, filters
+    )
+    next_cursor = (
+        _encode_cursor(items[-1]["created_at"], items[-1]["id"]) if items and len(items) == limit else None
+    )
+    return items, total, next_cursor
+
+
+def _run_columns(include_log: bool) -> tuple[Any, ...]:
+    columns = (AgentRun.id, AgentRun.project_id, AgentRun.status, AgentRun.plan, AgentRun.created_at)
+    return (*columns, AgentRun.log) if include_log else columns
+
+
+def _run_reads(rows: Iterable[Any], include_log: bool) -> list[AgentRunRead]:
     return [
-        AgentRunRead(
-            id=item.id,
-            project_id=item.project_id,
-            status=AgentRunStatus(item.status),
-            plan=_normalize_plan(item.plan),
-            log=item.log or [],
+        AgentRunRead.model_construct(
+            id=row["id"],
+            project_id=row["project_id"],
+            status=AgentRunStatus(row["status"]),
+            plan=_normalize_plan(row["plan"]),
+            log=(row.get("log") or []) if include_log else [],
         )
-        for item in results
+        for row in rows
     ]
 
 
+def list_runs(
+    project_id: str, limit: int = 100, offset: int = 0, include_log: bool = True
+) -> list[AgentRunRead]:
+    with get_session() as session:
+        rows = session.exec(
+            _page_query(select(*_run_columns(include_log)), AgentRun, project_id, limit, offset, None)
+        ).mappings().all()
+    return _run_reads(rows, include_log)
+
+
+def list_runs_with_total(
+    project_id: str,
+    limit: int = 100,
+    offset: int = 0,
+    include_log: bool = True,
+    after: str | None = None,
+) -> tuple[list[AgentRunRead], int, str | None]:
+    with get_session() as session:
+        rows, total, next_cursor = _list_rows_with_total(
+            session, AgentRun, project_id, limit, offset, after, _run_columns(include_log)
+        )
+    return _run_reads(rows, include_log), total, next_cursor
+
+
 def count_runs(project_id: str) -> int:
     with get_session() as session:
-        result = session.exec(
-            select(func.count()).select_from(AgentRun).where(AgentRun.project_id == project_id)
-        ).one()
-    return int(result or 0)
+        return session.scalar(
+            select(func.count(AgentRun.id)).where(AgentRun.project_id == project_id)
+        ) or 0
 
 
 def get_run(project_id: str, run_id: str) -> AgentRunRead | None:
@@ -962,13 +1564,7 @@ def get_run(project_id: str, run_id: str) -> AgentRunRead | None:
         run = session.get(AgentRun, run_id)
     if not run or run.project_id != project_id:
         return None
-    return AgentRunRead(
-        id=run.id,
-        project_id=run.project_id,
-        status=AgentRunStatus(run.status),
-        plan=_normalize_plan(run.plan),
-        log=run.log or [],
-    )
+    return _agent_run_read(run)
 
 
 def list_chat_messages(project_id: str, limit: int = 100, offset: int = 0) -> list[AgentChatMessage]:
@@ -981,14 +1577,20 @@ def list_chat_messages(project_id: str, limit: int = 100, offset: int = 0) -> li
         ))
 
 
+def list_chat_messages_rows(
+    project_id: str, limit: int = 100, offset: int = 0, after: str | None = None
+) -> tuple[list[dict[str, Any]], int, str | None]:
+    with get_session() as session:
+        return _list_rows_with_total(session, AgentChatMessage, project_id, limit, offset, after)
+
+
 def count_chat_messages(project_id: str) -> int:
     with get_session() as session:
-        result = session.exec(
-            select(func.count())
-            .select_from(AgentChatMessage)
-            .where(AgentChatMessage.project_id == project_id)
-        ).one()
-    return int(result or 0)
+        return session.scalar(
+            select(func.count(AgentChatMessage.id)).where(
+                AgentChatMessage.project_id == project_id
+            )
+        ) or 0
 
 
 def list_agent_artifacts(
@@ -1007,19 +1609,37 @@ def list_agent_artifacts(
         return list(session.exec(query.limit(limit).offset(offset)))
 
 
+def list_agent_artifacts_rows(
+    project_id: str,
+    run_id: str | None = None,
+    snapshot_id: str | None = None,
+    limit: int = 100,
+    offset: int = 0,
+    after: str | None = None,
+) -> tuple[list[dict[str, Any]], int, str | None]:
+    filters: list[Any] = []
+    if run_id:
+        filters.append(AgentArtifact.run_id == run_id)
+    if snapshot_id:
+        filters.append(AgentArtifact.snapshot_id == snapshot_id)
+    with get_session() as session:
+        return _list_rows_with_total(
+            session, AgentArtifact, project_id, limit, offset, after, filters=tuple(filters)
+        )
+
+
 def count_agent_artifacts(
     project_id: str, run_id: str | None, snapshot_id: str | None
 ) -> int:
     with get_session() as session:
-        query = select(func.count()).select_from(AgentArtifact).where(
+        query = select(func.count(AgentArtifact.id)).where(
             AgentArtifact.project_id == project_id
         )
         if run_id:
             query = query.where(AgentArtifact.run_id == run_id)
         if snapshot_id:
             query = query.where(AgentArtifact.snapshot_id == snapshot_id)
-        result = session.exec(query).one()
-    return int(result or 0)
+        return session.scalar(query) or 0
 
 
 def get_agent_artifact(project_id: str, artifact_id: str) -> AgentArtifact | None:
@@ -1040,35 +1660,103 @@ def list_snapshots(project_id: str, limit: int = 100, offset: int = 0) -> list[A
         ))
 
 
+def list_snapshots_rows(
+    project_id: str, limit: int = 100, offset: int = 0, after: str | None = None
+) -> tuple[list[dict[str, Any]], int, str | None]:
+    with get_session() as session:
+        return _list_rows_with_total(session, AgentSnapshot, project_id, limit, offset, after)
+
+
 def count_snapshots(project_id: str) -> int:
     with get_session() as session:
-        result = session.exec(
-            select(func.count())
-            .select_from(AgentSnapshot)
-            .where(AgentSnapshot.project_id == project_id)
-        ).one()
-    return int(result or 0)
+        return session.scalar(
+            select(func.count(AgentSnapshot.id)).where(AgentSnapshot.project_id == project_id)
+        ) or 0
+
+
+def _snapshot_source(workspace_root: Path, target_path: str) -> Path | None:
+    try:
+        source = (workspace_root / target_path).resolve()
+    except (OSError, RuntimeError):
+        return None
+    if not source.is_relative_to(workspace_root) or not source.is_file():
+        return None
+    return source
+
+
+def _copy_snapshot_file(source: Path, dest_path: Path) -> int:
+    dest_path.parent.mkdir(parents=True, exist_ok=True)
+    with source.open("rb") as src, dest_path.open("wb") as dst:
+        size = os.fstat(src.fileno()).st_size
+        if hasattr(os, "copy_file_range"):
+            copied = 0
+            try:
+                while copied < size:
+                    sent = os.copy_file_range(src.fileno(), dst.fileno(), size - copied)
+                    if sent == 0:
+                        break
+                    copied += sent
+                return copied
+            except OSError:
+                src.seek(0)
+                dst.seek(0)
+                dst.truncate()
+        shutil.copyfileobj(src, dst)
+        return dst.tell()
 
 
-def create_snapshot(
+def _create_snapshot_row(
+    snapshot: AgentSnapshot, artifact: AgentArtifact | None = None
+) -> AgentSnapshot:
+    with get_session() as session:
+        session.add(snapshot)
+        if artifact:
+            session.add(artifact)
+        session.flush()
+        session.expunge(snapshot)
+        session.commit()
+    return snapshot
+
+
+def create_snapshot_record(
     project_id: str,
     kind: str,
     target_path: str,
     run_id: str | None,
     details: dict | None,
+    project: ProjectRead | None = None,
 ) -> AgentSnapshot:
+    snapshot_id = uuid4().hex
+    snapshot_details = details or {"snapshot_path": target_path}
+    artifact: AgentArtifact | None = None
+    project = project or store.get_project(project_id)
+    workspace_root = store.resolve_workspace(project.workspace_path) if project else None
+    source = _snapshot_source(workspace_root, target_path) if workspace_root else None
+    if workspace_root and source:
+        dest_path = workspace_root / "artifacts" / "snapshots" / snapshot_id / source.name
+        size = _copy_snapshot_file(source, dest_path)
+        snapshot_details = {
+            **(details or {}),
+            "snapshot_path": str(dest_path),
+        }
+        artifact = AgentArtifact(
+            project_id=project_id,
+            run_id=run_id,
+            snapshot_id=snapshot_id,
+            type="snapshot_file",
+            path=str(dest_path),
+            mime_type=mimetypes.guess_type(dest_path.name)[0] or "application/octet-stream",
+            size=size,
+        )
     snapshot = AgentSnapshot(
+        id=snapshot_id,
         project_id=project_id,
         run_id=run_id,
         kind=kind,
         target_path=target_path,
-        details=details or {"snapshot_path": target_path},
+        details=snapshot_details,
     )
-    with get_session() as session:
-        session.add(snapshot)
-        session.commit()
-        session.refresh(snapshot)
-    return snapshot
+    return _create_snapshot_row(snapshot, artifact)
 
 
 def restore_snapshot(project_id: str, snapshot_id: str) -> AgentRollback | None:
@@ -1084,8 +1772,9 @@ def restore_snapshot(project_id: str, snapshot_id: str) -> AgentRollback | None:
             note="snapshot restore",
         )
         session.add(rollback)
+        session.flush()
+        session.expunge(rollback)
         session.commit()
-        session.refresh(rollback)
     return rollback
 
 
@@ -1104,8 +1793,9 @@ def create_rollback(
     )
     with get_session() as session:
         session.add(rollback)
+        session.flush()
+        session.expunge(rollback)
         session.commit()
-        session.refresh(rollback)
     return rollback
 
 
@@ -1119,37 +1809,32 @@ def list_rollbacks(project_id: str, limit: int = 100, offset: int = 0) -> list[A
         ))
 
 
-def count_rollbacks(project_id: str) -> int:
+def list_rollbacks_rows(
+    project_id: str, limit: int = 100, offset: int = 0, after: str | None = None
+) -> tuple[list[dict[str, Any]], int, str | None]:
     with get_session() as session:
-        result = session.exec(
-            select(func.count())
-            .select_from(AgentRollback)
-            .where(AgentRollback.project_id == project_id)
-        ).one()
-    return int(result or 0)
+        return _list_rows_with_total(session, AgentRollback, project_id, limit, offset, after)
 
 
-def apply_rollback(project_id: str, rollback_id: str) -> AgentRollback | None:
+def count_rollbacks(project_id: str) -> int:
     with get_session() as session:
-        rollback = session.get(AgentRollback, rollback_id)
-        if not rollback or rollback.project_id != project_id:
-            return None
-        rollback.status = "applied"
-        session.add(rollback)
-        session.commit()
-        session.refresh(rollback)
-    return rollback
+        return session.scalar(
+            select(func.count(AgentRollback.id)).where(AgentRollback.project_id == project_id)
+        ) or 0
 
 
-def cancel_rollback(project_id: str, rollback_id: str) -> AgentRollback | None:
+def set_rollback_status(project_id: str, rollback_id: str, status: str) -> AgentRollback | None:
     with get_session() as session:
-        rollback = session.get(AgentRollback, rollback_id)
-        if not rollback or rollback.project_id != project_id:
+        rollback = session.exec(
+            update(AgentRollback)
+            .where(AgentRollback.id == rollback_id, AgentRollback.project_id == project_id)
+            .values(status=status)
+            .returning(AgentRollback)
+        ).scalar_one_or_none()
+        if not rollback:
             return None
-        rollback.status = "cancelled"
-        session.add(rollback)
+        session.expunge(rollback)
         session.commit()
-        session.refresh(rollback)
     return rollback
 
 
@@ -1171,8 +1856,9 @@ def create_skill(
     )
     with get_session() as session:
         session.add(skill)
+        session.flush()
+        session.expunge(skill)
         session.commit()
-        session.refresh(skill)
     return skill
 
 
@@ -1186,6 +1872,13 @@ def list_skills(project_id: str, limit: int = 100, offset: int = 0) -> list[Agen
         ))
 
 
+def list_skills_rows(
+    project_id: str, limit: int = 100, offset: int = 0, after: str | None = None
+) -> tuple[list[dict[str, Any]], int, str | None]:
+    with get_session() as session:
+        return _list_rows_with_total(session, AgentSkill, project_id, limit, offset, after)
+
+
 def _normalize_plan(payload: Any | None) -> AgentPlanCreate:
     if isinstance(payload, dict):
         return AgentPlanCreate.model_validate(payload)
@@ -1194,12 +1887,9 @@ def _normalize_plan(payload: Any | None) -> AgentPlanCreate:
 
 def count_skills(project_id: str) -> int:
     with get_session() as session:
-        result = session.exec(
-            select(func.count())
-            .select_from(AgentSkill)
-            .where(AgentSkill.project_id == project_id)
-        ).one()
-    return int(result or 0)
+        return session.scalar(
+            select(func.count(AgentSkill.id)).where(AgentSkill.project_id == project_id)
+        ) or 0
 
 
 def get_skill(project_id: str, skill_id: str) -> AgentSkill | None:
@@ -1212,22 +1902,23 @@ def get_skill(project_id: str, skill_id: str) -> AgentSkill | None:
 
 def update_skill(project_id: str, skill_id: str, updates: dict[str, Any]) -> AgentSkill | None:
     with get_session() as session:
-        skill = session.get(AgentSkill, skill_id)
-        if not skill or skill.project_id != project_id:
+        skill = session.exec(
+            update(AgentSkill)
+            .where(AgentSkill.id == skill_id, AgentSkill.project_id == project_id)
+            .values(**updates, updated_at=datetime.now(timezone.utc))
+            .returning(AgentSkill)
+        ).scalar_one_or_none()
+        if not skill:
             return None
-        for key, value in updates.items():
-            setattr(skill, key, value)
-        session.add(skill)
+        session.expunge(skill)
         session.commit()
-        session.refresh(skill)
     return skill
 
 
 def delete_skill(project_id: str, skill_id: str) -> bool:
     with get_session() as session:
-        skill = session.get(AgentSkill, skill_id)
-        if not skill or skill.project_id != project_id:
-            return False
-        session.delete(skill)
+        result = session.exec(
+            delete(AgentSkill).where(AgentSkill.id == skill_id, AgentSkill.project_id == project_id)
+        )
         session.commit()
-    return True
+    return result.rowcount > 0
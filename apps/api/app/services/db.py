@@ -1,7 +1,10 @@
 from __future__ import annotations
 
+from functools import lru_cache
 from pathlib import Path
 
+from pydantic_core import from_json, to_json
+from sqlalchemy import inspect, text
 from sqlmodel import SQLModel, Session, create_engine
 
 from app.models.db import (
@@ -23,15 +26,49 @@ def _db_path() -> Path:
     return base_dir / "app.db"
 
 
+def _json_serializer(value: object) -> str:
+    return to_json(value).decode("utf-8")
+
+
+@lru_cache(maxsize=1)
 def get_engine():
+    # Shared so every session reuses the pool and compiled-statement cache.
     return create_engine(
-        f"sqlite:///{_db_path()}", connect_args={"check_same_thread": False}
+        f"sqlite:///{_db_path()}",
+        connect_args={"check_same_thread": False},
+        query_cache_size=1200,
+        json_serializer=_json_serializer,
+        json_deserializer=from_json,
     )
 
 
+def _check_agent_artifact_duplicates(engine) -> None:
+    existing = {index["name"] for index in inspect(engine).get_indexes("agentartifact")}
+    if "ux_agentartifact_project_run_path" in existing:
+        return
+    with engine.connect() as conn:
+        duplicate = conn.execute(
+            text(
+                "SELECT 1 FROM agentartifact WHERE run_id IS NOT NULL "
+                "GROUP BY project_id, run_id, path HAVING COUNT(*) > 1 LIMIT 1"
+            )
+        ).first()
+    if duplicate:
+        raise RuntimeError(
+            "agentartifact has duplicate (project_id, run_id, path) rows; "
+            "run scripts/dedupe_agent_artifacts.py before starting the API"
+        )
+
+
 def init_db() -> None:
     engine = get_engine()
     SQLModel.metadata.create_all(engine)
+    _check_agent_artifact_duplicates(engine)
+    # create_all skips tables that already exist, so indexes added to existing
+    # models must be created separately.
+    for table in SQLModel.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(engine, checkfirst=True)
 
 
 def get_session() -> Session:
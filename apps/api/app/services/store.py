@@ -1,12 +1,15 @@
 from __future__ import annotations
 
+from contextvars import ContextVar
 from datetime import datetime, timezone
+from functools import lru_cache
 import csv
-import json
 from pathlib import Path
 import shutil
 
-from sqlalchemy import func
+from pydantic import TypeAdapter
+from pydantic_core import to_json
+from sqlalchemy import delete, func, update
 from sqlmodel import select
 
 from app.models.db import Artifact, Dataset, Project, Run
@@ -21,6 +24,13 @@ from app.models.schemas import (
 )
 from app.services.db import get_session
 
+_dataset_cache: ContextVar[dict[str, DatasetRead] | None] = ContextVar("dataset_cache", default=None)
+
+_PROJECT_LIST_ADAPTER = TypeAdapter(list[ProjectRead])
+_DATASET_LIST_ADAPTER = TypeAdapter(list[DatasetRead])
+_RUN_LIST_ADAPTER = TypeAdapter(list[RunRead])
+_ARTIFACT_LIST_ADAPTER = TypeAdapter(list[ArtifactRead])
+
 
 def _repo_root() -> Path:
     current = Path(__file__).resolve()
@@ -30,6 +40,11 @@ def _repo_root() -> Path:
     return Path.cwd()
 
 
+@lru_cache(maxsize=128)
+def resolve_workspace(workspace_path: str) -> Path:
+    return Path(workspace_path).resolve()
+
+
 def _ensure_project_workspace(project_id: str) -> Path:
     root = _repo_root() / "projects" / project_id
     (root / "data" / "raw").mkdir(parents=True, exist_ok=True)
@@ -56,7 +71,7 @@ def _resolve_source_path(source: str) -> Path | None:
     if not _is_probable_file_source(source):
         return None
     source_path = Path(source.replace("file://", "")).expanduser().resolve()
-    if not source_path.exists() or not source_path.is_file():
+    if not source_path.is_file():
         return None
     return source_path
 
@@ -65,12 +80,12 @@ def _maybe_copy_source(project_id: str, source: str) -> Path | None:
     if not _is_probable_file_source(source):
         return None
     source_path = Path(source.replace("file://", "")).expanduser().resolve()
-    if not source_path.exists() or not source_path.is_file():
+    if not source_path.is_file():
         raise FileNotFoundError(f"Source file not found: {source}")
     dest_dir = _repo_root() / "projects" / project_id / "data" / "raw"
     dest_dir.mkdir(parents=True, exist_ok=True)
     dest_path = dest_dir / source_path.name
-    shutil.copy2(source_path, dest_path)
+    shutil.copyfile(source_path, dest_path)
     return dest_path
 
 
@@ -146,13 +161,12 @@ def list_projects(limit: int = 100, offset: int = 0) -> list[ProjectRead]:
             .offset(offset)
             .limit(limit)
         ).all()
-    return [_project_read(project) for project in projects]
+    return _PROJECT_LIST_ADAPTER.validate_python(projects, from_attributes=True)
 
 
 def count_projects() -> int:
     with get_session() as session:
-        total = session.exec(select(func.count()).select_from(Project)).one()
-    return int(total)
+        return session.scalar(select(func.count(Project.id))) or 0
 
 
 def get_project(project_id: str) -> ProjectRead | None:
@@ -184,8 +198,8 @@ def delete_project(project_id: str) -> None:
             session.delete(project)
         session.commit()
     if workspace_root:
-        repo_root = _repo_root().resolve()
-        workspace_root = workspace_root.resolve()
+        repo_root = _repo_root()
+        workspace_root = resolve_workspace(str(workspace_root))
         if workspace_root.is_dir() and workspace_root.is_relative_to(repo_root):
             shutil.rmtree(workspace_root, ignore_errors=True)
 
@@ -230,15 +244,14 @@ def list_datasets(project_id: str, limit: int = 100, offset: int = 0) -> list[Da
             .offset(offset)
             .limit(limit)
         ).all()
-    return [_dataset_read(dataset) for dataset in datasets]
+    return _DATASET_LIST_ADAPTER.validate_python(datasets, from_attributes=True)
 
 
 def count_datasets(project_id: str) -> int:
     with get_session() as session:
-        total = session.exec(
-            select(func.count()).select_from(Dataset).where(Dataset.project_id == project_id)
-        ).one()
-    return int(total)
+        return session.scalar(
+            select(func.count(Dataset.id)).where(Dataset.project_id == project_id)
+        ) or 0
 
 
 def get_dataset(dataset_id: str) -> DatasetRead | None:
@@ -247,6 +260,18 @@ def get_dataset(dataset_id: str) -> DatasetRead | None:
     return _dataset_read(dataset) if dataset else None
 
 
+def _get_dataset_cached(dataset_id: str) -> DatasetRead | None:
+    cache = _dataset_cache.get()
+    if cache is None:
+        return get_dataset(dataset_id)
+    if dataset_id not in cache:
+        dataset = get_dataset(dataset_id)
+        if not dataset:
+            return None
+        cache[dataset_id] = dataset
+    return cache[dataset_id]
+
+
 def get_dataset_file_path(project_id: str, dataset_id: str) -> Path | None:
     with get_session() as session:
         dataset = session.get(Dataset, dataset_id)
@@ -256,7 +281,7 @@ def get_dataset_file_path(project_id: str, dataset_id: str) -> Path | None:
     source_path = _resolve_source_path(dataset.source)
     if not source_path:
         return None
-    workspace_root = Path(project.workspace_path).resolve()
+    workspace_root = resolve_workspace(project.workspace_path)
     source_path = source_path.resolve()
     if not source_path.is_relative_to(workspace_root):
         return None
@@ -301,8 +326,8 @@ def delete_dataset(project_id: str, dataset_id: str) -> None:
         session.delete(dataset)
         session.commit()
     if workspace_root and source_path:
-        repo_root = _repo_root().resolve()
-        workspace_root = workspace_root.resolve()
+        repo_root = _repo_root()
+        workspace_root = resolve_workspace(str(workspace_root))
         source_path = source_path.resolve()
         if source_path.is_file() and source_path.is_relative_to(workspace_root) and source_path.is_relative_to(repo_root):
             source_path.unlink(missing_ok=True)
@@ -321,20 +346,34 @@ def create_run(project_id: str, payload: RunCreate) -> RunRead:
         session.add(run)
         session.commit()
         session.refresh(run)
-    _execute_run_stub(project_id, run.id, payload.dataset_id, payload.type)
+    if payload.background:
+        return _run_read(run)
+    execute_run(project_id, run.id, payload.dataset_id, payload.type)
     return get_run(run.id) or _run_read(run)
 
 
-def _execute_run_stub(project_id: str, run_id: str, dataset_id: str, run_type: str) -> None:
+def execute_run(project_id: str, run_id: str, dataset_id: str, run_type: str) -> None:
+    token = _dataset_cache.set({})
+    try:
+        _execute_run_steps(project_id, run_id, dataset_id, run_type)
+    except Exception:
+        with get_session() as session:
+            session.exec(
+                update(Run).where(Run.id == run_id).values(status="failed", finished_at=_now())
+            )
+            session.commit()
+        raise
+    finally:
+        _dataset_cache.reset(token)
+
+
+def _execute_run_steps(project_id: str, run_id: str, dataset_id: str, run_type: str) -> None:
     workspace = _ensure_project_workspace(project_id)
     artifacts_dir = workspace / "artifacts"
     artifacts_dir.mkdir(parents=True, exist_ok=True)
     with get_session() as session:
-        run = session.get(Run, run_id)
-        if run:
-            run.status = "running"
-            session.add(run)
-            session.commit()
+        session.exec(update(Run).where(Run.id == run_id).values(status="running"))
+        session.commit()
     artifacts_to_create: list[tuple[str, Path, str]] = []
     artifact_path = artifacts_dir / f"{run_type}-{run_id}.json"
     log_path = artifacts_dir / f"{run_type}-{run_id}.log"
@@ -355,7 +394,7 @@ def _execute_run_stub(project_id: str, run_id: str, dataset_id: str, run_type: s
         if analysis:
             summary["analysis"] = analysis
             analysis_path = artifacts_dir / f"analysis-{run_id}.json"
-            analysis_path.write_text(json.dumps(analysis, indent=2))
+            analysis_path.write_bytes(to_json(analysis, indent=2))
             artifacts_to_create.append(("analysis_summary", analysis_path, "application/json"))
     if run_type == "report":
         report = _build_report(dataset_id)
@@ -363,7 +402,7 @@ def _execute_run_stub(project_id: str, run_id: str, dataset_id: str, run_type: s
             summary["report"] = {"markdown": str(report["markdown"]), "html": str(report["html"])}
             artifacts_to_create.append(("report_markdown", report["markdown"], "text/markdown"))
             artifacts_to_create.append(("report_html", report["html"], "text/html"))
-    artifact_path.write_text(json.dumps(summary, indent=2))
+    artifact_path.write_bytes(to_json(summary, indent=2))
     log_path.write_text(
         "\n".join(
             [
@@ -378,11 +417,9 @@ def _execute_run_stub(project_id: str, run_id: str, dataset_id: str, run_type: s
     artifacts_to_create.append(("run_log", log_path, "text/plain"))
     finished_at = _now()
     with get_session() as session:
-        run = session.get(Run, run_id)
-        if run:
-            run.status = "completed"
-            run.finished_at = finished_at
-            session.add(run)
+        session.exec(
+            update(Run).where(Run.id == run_id).values(status="completed", finished_at=finished_at)
+        )
         for artifact_type, path, mime_type in artifacts_to_create:
             artifact = Artifact(
                 run_id=run_id,
@@ -438,16 +475,18 @@ def _profile_dataset(dataset_id: str) -> dict[str, object] | None:
         dataset.schema_snapshot = schema_snapshot
         session.add(dataset)
         session.commit()
+        cache = _dataset_cache.get()
+        if cache is not None:
+            cache.pop(dataset_id, None)
         return {"stats": stats, "schema": schema_snapshot, "source": str(source_path)}
 
 
 def _build_report(dataset_id: str) -> dict[str, Path] | None:
-    with get_session() as session:
-        dataset = session.get(Dataset, dataset_id)
-        if not dataset:
-            return None
-        stats = dataset.stats or {}
-        schema = dataset.schema_snapshot or {}
+    dataset = _get_dataset_cached(dataset_id)
+    if not dataset:
+        return None
+    stats = dataset.stats or {}
+    schema = dataset.schema_snapshot or {}
     analysis = _analyze_dataset(dataset_id) or {}
     workspace = _repo_root() / "projects" / dataset.project_id
     artifacts_dir = workspace / "artifacts"
@@ -526,13 +565,12 @@ def _build_report(dataset_id: str) -> dict[str, Path] | None:
 
 
 def _analyze_dataset(dataset_id: str) -> dict[str, object] | None:
-    with get_session() as session:
-        dataset = session.get(Dataset, dataset_id)
-        if not dataset:
-            return None
-        source_path = _resolve_source_path(dataset.source)
-        if not source_path:
-            return None
+    dataset = _get_dataset_cached(dataset_id)
+    if not dataset:
+        return None
+    source_path = _resolve_source_path(dataset.source)
+    if not source_path:
+        return None
     sample_rows: list[list[str]] = []
     header: list[str] = []
     with source_path.open("r", encoding="utf-8-sig", errors="replace", newline="") as handle:
@@ -559,15 +597,14 @@ def list_runs(project_id: str, limit: int = 100, offset: int = 0) -> list[RunRea
             .offset(offset)
             .limit(limit)
         ).all()
-    return [_run_read(run) for run in runs]
+    return _RUN_LIST_ADAPTER.validate_python(runs, from_attributes=True)
 
 
 def count_runs(project_id: str) -> int:
     with get_session() as session:
-        total = session.exec(
-            select(func.count()).select_from(Run).where(Run.project_id == project_id)
-        ).one()
-    return int(total)
+        return session.scalar(
+            select(func.count(Run.id)).where(Run.project_id == project_id)
+        ) or 0
 
 
 def get_run(run_id: str) -> RunRead | None:
@@ -591,8 +628,8 @@ def delete_run(project_id: str, run_id: str) -> None:
         session.delete(run)
         session.commit()
     if workspace_root:
-        repo_root = _repo_root().resolve()
-        workspace_root = workspace_root.resolve()
+        repo_root = _repo_root()
+        workspace_root = resolve_workspace(str(workspace_root))
         for artifact in artifacts:
             artifact_path = Path(artifact.path).resolve()
             if artifact_path.is_file() and artifact_path.is_relative_to(workspace_root) and artifact_path.is_relative_to(repo_root):
@@ -607,42 +644,34 @@ def list_artifacts(run_id: str, limit: int = 100, offset: int = 0) -> list[Artif
             .offset(offset)
             .limit(limit)
         ).all()
-    return [_artifact_read(artifact) for artifact in artifacts]
+    return _ARTIFACT_LIST_ADAPTER.validate_python(artifacts, from_attributes=True)
 
 
 def list_project_artifacts(
     project_id: str, run_id: str | None = None, limit: int = 100, offset: int = 0
 ) -> list[ArtifactRead]:
     with get_session() as session:
-        runs = session.exec(select(Run).where(Run.project_id == project_id)).all()
-        run_ids = {run.id for run in runs}
-        if run_id:
-            if run_id not in run_ids:
-                return []
-            run_ids = {run_id}
-        if not run_ids:
-            return []
-        artifacts = session.exec(
+        query = (
             select(Artifact)
-            .where(Artifact.run_id.in_(run_ids))
-            .offset(offset)
-            .limit(limit)
-        ).all()
-    return [_artifact_read(artifact) for artifact in artifacts]
+            .join(Run, Artifact.run_id == Run.id)
+            .where(Run.project_id == project_id)
+        )
+        if run_id:
+            query = query.where(Artifact.run_id == run_id)
+        artifacts = session.exec(query.offset(offset).limit(limit)).all()
+    return _ARTIFACT_LIST_ADAPTER.validate_python(artifacts, from_attributes=True)
 
 
 def count_project_artifacts(project_id: str, run_id: str | None = None) -> int:
     with get_session() as session:
         query = (
-            select(func.count())
-            .select_from(Artifact)
+            select(func.count(Artifact.id))
             .join(Run, Artifact.run_id == Run.id)
             .where(Run.project_id == project_id)
         )
         if run_id:
             query = query.where(Artifact.run_id == run_id)
-        total = session.exec(query).one()
-    return int(total)
+        return session.scalar(query) or 0
 
 
 def get_artifact(artifact_id: str) -> ArtifactRead | None:
@@ -655,18 +684,21 @@ def delete_artifact(project_id: str, artifact_id: str) -> None:
     workspace_root: Path | None = None
     artifact_path: Path | None = None
     with get_session() as session:
-        artifact = session.get(Artifact, artifact_id)
-        run = session.get(Run, artifact.run_id) if artifact else None
-        project = session.get(Project, project_id)
-        if not artifact or not run or not project or run.project_id != project_id:
+        row = session.exec(
+            select(Artifact.path, Project.workspace_path)
+            .join(Run, Run.id == Artifact.run_id)
+            .join(Project, Project.id == Run.project_id)
+            .where(Artifact.id == artifact_id, Project.id == project_id)
+        ).first()
+        if not row:
             return
-        artifact_path = Path(artifact.path)
-        workspace_root = Path(project.workspace_path)
-        session.delete(artifact)
+        artifact_path = Path(row[0])
+        workspace_root = Path(row[1])
+        session.exec(delete(Artifact).where(Artifact.id == artifact_id))
         session.commit()
     if workspace_root and artifact_path:
-        repo_root = _repo_root().resolve()
-        workspace_root = workspace_root.resolve()
+        repo_root = _repo_root()
+        workspace_root = resolve_workspace(str(workspace_root))
         artifact_path = artifact_path.resolve()
         if artifact_path.is_file() and artifact_path.is_relative_to(workspace_root) and artifact_path.is_relative_to(repo_root):
             artifact_path.unlink(missing_ok=True)
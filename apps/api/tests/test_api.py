@@ -1,6 +1,11 @@
 from pathlib import Path
+import shutil
+import sqlite3
+
+import pytest
 
 from app.services import agent as agent_service
+from app.services import store
 
 
 def test_health(client):
@@ -68,6 +73,16 @@ def test_project_dataset_run_flow(client, tmp_path: Path):
     )
     assert delete_run_resp.status_code == 204
 
+    background_run_resp = client.post(
+        f"/projects/{project_id}/runs",
+        json={"dataset_id": dataset["id"], "type": "profile", "background": True},
+    )
+    assert background_run_resp.status_code == 201
+    background_run = background_run_resp.json()
+    assert background_run["status"] == "queued"
+    background_get_resp = client.get(f"/projects/{project_id}/runs/{background_run['id']}")
+    assert background_get_resp.json()["status"] == "completed"
+
     report_resp = client.post(
         f"/projects/{project_id}/runs",
         json={"dataset_id": dataset["id"], "type": "report"},
@@ -126,6 +141,17 @@ def test_agent_run_executes_plan(client, tmp_path: Path, monkeypatch):
                 "args": {"path": "scripts/agent/test_script.py"},
                 "requires_approval": False,
             },
+            {
+                "id": "step-rewrite",
+                "title": "Rewrite script",
+                "description": "Overwrite the script.",
+                "tool": "write_file",
+                "args": {
+                    "path": "scripts/agent/test_script.py",
+                    "content": "print('ok again')\n",
+                },
+                "requires_approval": False,
+            },
         ],
     }
     run_payload = {
@@ -152,10 +178,17 @@ def test_agent_run_executes_plan(client, tmp_path: Path, monkeypatch):
     assert agent_artifacts_resp.status_code == 200
     agent_artifacts = agent_artifacts_resp.json()
     assert len(agent_artifacts) >= 1
+    artifact_paths = [artifact["path"] for artifact in agent_artifacts]
+    assert len(artifact_paths) == len(set(artifact_paths))
 
     list_runs_resp = client.get(f"/projects/{project_id}/agent/runs")
     assert list_runs_resp.status_code == 200
     assert list_runs_resp.headers.get("x-total-count")
+    summary_runs_resp = client.get(
+        f"/projects/{project_id}/agent/runs", params={"include_log": "false"}
+    )
+    assert summary_runs_resp.status_code == 200
+    assert all(run["log"] == [] for run in summary_runs_resp.json())
 
     snapshots_resp = client.get(f"/projects/{project_id}/agent/snapshots")
     assert snapshots_resp.status_code == 200
@@ -165,9 +198,29 @@ def test_agent_run_executes_plan(client, tmp_path: Path, monkeypatch):
         json={"note": "test rollback"},
     )
     assert rollback_resp.status_code == 201
+    rollback_id = rollback_resp.json()["id"]
+    apply_resp = client.post(f"/projects/{project_id}/agent/rollbacks/{rollback_id}/apply")
+    assert apply_resp.status_code == 200
+    assert apply_resp.json()["status"] == "applied"
+    missing_rollback_resp = client.post(f"/projects/{project_id}/agent/rollbacks/missing/cancel")
+    assert missing_rollback_resp.status_code == 404
 
     list_skills_resp = client.get(f"/projects/{project_id}/agent/skills")
     assert list_skills_resp.status_code == 200
+    skill_resp = client.post(
+        f"/projects/{project_id}/agent/skills",
+        json={"name": "explore", "description": "Explore files", "toolchain": ["list_dir", "read_file"]},
+    )
+    assert skill_resp.status_code == 201
+    skill_plan_resp = client.get(f"/projects/{project_id}/agent/skills/{skill_resp.json()['id']}/plan")
+    assert skill_plan_resp.status_code == 200
+    skill_plan = skill_plan_resp.json()
+    assert skill_plan["objective"] == "explore"
+    assert [step["tool"] for step in skill_plan["steps"]] == ["list_dir", "read_file"]
+    assert skill_plan["steps"][0]["id"] is None
+    skill_url = f"/projects/{project_id}/agent/skills/{skill_resp.json()['id']}"
+    assert client.delete(skill_url).status_code == 204
+    assert client.delete(skill_url).status_code == 404
 
     chat_send_resp = client.post(
         f"/projects/{project_id}/agent/chat",
@@ -182,6 +235,262 @@ def test_agent_run_executes_plan(client, tmp_path: Path, monkeypatch):
     chat_payload = chat_send_resp.json()
     assert len(chat_payload["messages"]) == 2
 
+    background_resp = client.post(
+        f"/projects/{project_id}/agent/chat",
+        json={"content": "List files again.", "auto_run": True, "background": True},
+    )
+    assert background_resp.status_code == 201
+    background_run = background_resp.json()["run"]
+    assert background_run["status"] == "pending"
+    background_run_resp = client.get(f"/projects/{project_id}/agent/runs/{background_run['id']}")
+    assert background_run_resp.json()["status"] == "completed"
+
     chat_list_resp = client.get(f"/projects/{project_id}/agent/chat/messages")
     assert chat_list_resp.status_code == 200
     assert chat_list_resp.headers.get("x-total-count")
+
+
+def test_agent_runs_cursor_pagination(client):
+    project_id = client.post("/projects", json={"name": "Paging Project"}).json()["id"]
+    runs_url = f"/projects/{project_id}/agent/runs"
+    plan = {
+        "objective": "List files",
+        "steps": [
+            {"title": "List", "description": "List the root.", "tool": "list_dir", "args": {"path": "."}}
+        ],
+    }
+    created = [
+        client.post(runs_url, json={"plan": plan, "approvals": {}}).json()["id"] for _ in range(5)
+    ]
+
+    paged: list[str] = []
+    cursor = None
+    for expected_size in (2, 2, 1):
+        params = {"limit": 2, "include_log": "false"}
+        if cursor:
+            params["after"] = cursor
+        page_resp = client.get(runs_url, params=params)
+        assert page_resp.status_code == 200
+        assert page_resp.headers["x-total-count"] == "5"
+        page = [run["id"] for run in page_resp.json()]
+        assert len(page) == expected_size
+        paged.extend(page)
+        cursor = page_resp.headers.get("x-next-cursor")
+    assert cursor is None
+    assert paged == created
+    assert [run["id"] for run in client.get(runs_url).json()] == created
+
+    bad_cursor_resp = client.get(runs_url, params={"after": "nope"})
+    assert bad_cursor_resp.status_code == 400
+
+
+def test_agent_snapshot_copies_file(client):
+    project = client.post("/projects", json={"name": "Snapshot Project"}).json()
+    project_id = project["id"]
+    target = Path(project["workspace_path"]) / "data" / "raw" / "notes.txt"
+    target.write_text("v1\n")
+
+    snapshot_resp = client.post(
+        f"/projects/{project_id}/agent/snapshots",
+        json={"kind": "file", "target_path": "data/raw/notes.txt"},
+    )
+    assert snapshot_resp.status_code == 201
+    snapshot = snapshot_resp.json()
+    snapshot_path = Path(snapshot["details"]["snapshot_path"])
+    assert snapshot_path.read_text() == "v1\n"
+    assert snapshot_path.is_relative_to(Path(project["workspace_path"]).resolve())
+
+    artifacts_resp = client.get(
+        f"/projects/{project_id}/agent/artifacts",
+        params={"snapshot_id": snapshot["id"]},
+    )
+    assert artifacts_resp.status_code == 200
+    assert [artifact["type"] for artifact in artifacts_resp.json()] == ["snapshot_file"]
+
+    unchanged_resp = client.post(
+        f"/projects/{project_id}/agent/snapshots",
+        json={"kind": "file", "target_path": "data/raw/notes.txt"},
+    )
+    unchanged_path = Path(unchanged_resp.json()["details"]["snapshot_path"])
+    assert unchanged_path != snapshot_path
+    assert unchanged_path.read_text() == "v1\n"
+    assert not unchanged_path.samefile(snapshot_path)
+    target.write_text("v2\n")
+    changed_resp = client.post(
+        f"/projects/{project_id}/agent/snapshots",
+        json={"kind": "file", "target_path": "data/raw/notes.txt"},
+    )
+    assert Path(changed_resp.json()["details"]["snapshot_path"]).read_text() == "v2\n"
+    assert snapshot_path.read_text() == "v1\n"
+
+    missing_resp = client.post(
+        f"/projects/{project_id}/agent/snapshots",
+        json={"kind": "file", "target_path": "data/raw/missing.txt"},
+    )
+    assert missing_resp.status_code == 201
+    assert missing_resp.json()["details"] == {"snapshot_path": "data/raw/missing.txt"}
+
+
+def test_query_db_reopens_replaced_database(tmp_path: Path):
+    db_path = tmp_path / "d.db"
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("CREATE TABLE t (a INTEGER)")
+    conn.close()
+    tools = agent_service.ProjectToolRuntime(project_id="p", workspace_root=tmp_path)
+    assert tools.list_db_tables("d.db")["tables"] == ["t"]
+
+    db_path.unlink()
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("CREATE TABLE t2 (b TEXT)")
+        conn.execute("INSERT INTO t2 VALUES ('x')")
+    conn.close()
+    assert tools.list_db_tables("d.db")["tables"] == ["t2"]
+    assert tools.query_db("SELECT * FROM t2", db_path="d.db")["rows"] == [("x",)]
+    tools.close()
+
+
+def test_query_db_is_read_only(tmp_path: Path):
+    with sqlite3.connect(tmp_path / "d.db") as conn:
+        conn.execute("CREATE TABLE t (a INTEGER, b TEXT)")
+        conn.executemany("INSERT INTO t VALUES (?, ?)", [(i, str(i)) for i in range(10)])
+    conn.close()
+    tools = agent_service.ProjectToolRuntime(project_id="p", workspace_root=tmp_path)
+
+    result = tools.query_db("SELECT a, b FROM t ORDER BY a", limit=3)
+    assert result == {"columns": ["a", "b"], "rows": [(0, "0"), (1, "1"), (2, "2")]}
+    assert tools.query_db("SELECT a, a FROM t", limit=1)["columns"] == ["a", "a"]
+    table_info = tools.query_db("PRAGMA table_info(t)")
+    assert [row[1] for row in table_info["rows"]] == ["a", "b"]
+    assert tools.list_db_tables()["columns"]["t"] == [
+        {"name": "a", "type": "INTEGER", "notnull": False},
+        {"name": "b", "type": "TEXT", "notnull": False},
+    ]
+    assert tools.failed_count == 0
+
+    denied = [
+        "INSERT INTO t VALUES (11, 'x')",
+        "DELETE FROM t",
+        "CREATE TABLE z (a)",
+        "ATTACH DATABASE 'other.db' AS other",
+        "SELECT load_extension('x')",
+        "PRAGMA writable_schema = 1",
+    ]
+    for sql in denied:
+        assert tools.query_db(sql)["error"] == "not authorized"
+    assert tools.failed_count == len(denied)
+    assert tools.query_db("SELECT count(*) FROM t")["rows"] == [(10,)]
+    assert not (tmp_path / "other.db").exists()
+    tools.close()
+
+
+@pytest.mark.parametrize("backend", ["python", "ripgrep"])
+def test_search_text_and_read_file(tmp_path: Path, monkeypatch, backend: str):
+    if backend == "ripgrep":
+        ripgrep = shutil.which("rg")
+        if ripgrep is None:
+            pytest.skip("ripgrep is not installed")
+        monkeypatch.setattr(agent_service, "_RIPGREP", ripgrep)
+    else:
+        monkeypatch.setattr(agent_service, "_RIPGREP", None)
+    (tmp_path / "notes.txt").write_text("alpha\nbeta value\ngamma\nbeta again\n")
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "sub" / "data.csv").write_text("id,beta\n1,2\n")
+    (tmp_path / ".hidden").mkdir()
+    (tmp_path / ".hidden" / "secret.txt").write_text("beta hidden\n")
+    (tmp_path / "blob.dat").write_bytes(b"\x00beta\n")
+    (tmp_path / "image.png").write_text("beta\n")
+    (tmp_path / "win.txt").write_bytes(b"one\r\nbeta win\r\n")
+    tools = agent_service.ProjectToolRuntime(project_id="p", workspace_root=tmp_path)
+
+    def found(**kwargs) -> list[tuple[str, int, str]]:
+        output = tools.search_text(**kwargs)
+        return sorted((item["path"], item["line"], item["text"]) for item in output["results"])
+
+    visible = [
+        ("notes.txt", 2, "beta value"),
+        ("notes.txt", 4, "beta again"),
+        ("sub/data.csv", 1, "id,beta"),
+        ("win.txt", 2, "beta win"),
+    ]
+    assert found(query="beta") == visible
+    assert found(query="beta", include_hidden=True) == [(".hidden/secret.txt", 1, "beta hidden"), *visible]
+    assert found(query="beta", path="sub") == [("sub/data.csv", 1, "id,beta")]
+    assert found(query=r"^beta \w+$", is_regex=True) == [*visible[:2], visible[3]]
+    assert found(query="gamma", is_regex=True) == [("notes.txt", 3, "gamma")]
+    assert len(found(query="beta", max_results=2)) == 2
+    assert found(query="missing") == []
+    assert tools.search_text(query="beta")["results"] == [
+        {"path": path, "line": line, "text": text} for path, line, text in visible
+    ]
+    assert found(query="b.ta", is_regex=True) == visible
+    assert tools.failed_count == 0
+
+    assert tools.read_file("notes.txt", start_line=2, end_line=3)["lines"] == ["beta value", "gamma"]
+    assert tools.read_file("notes.txt", start_line=4)["lines"] == ["beta again"]
+    assert tools.read_file("notes.txt", max_lines=1)["lines"] == ["alpha"]
+    assert tools.read_file("win.txt")["lines"] == ["one", "beta win"]
+    assert tools.read_file("blob.dat")["error"].startswith("Binary file detected")
+    assert tools.read_file("image.png")["error"].startswith("Binary file detected")
+
+
+def test_run_python_timeout_fails_the_call(client, tmp_path: Path, monkeypatch):
+    monkeypatch.setattr(agent_service, "_RUN_PYTHON_TIMEOUT", 0.5)
+    tools = agent_service.ProjectToolRuntime(project_id="p", workspace_root=tmp_path)
+    result = tools.run_python(code="import time\nprint('started', flush=True)\ntime.sleep(30)\n")
+    assert result["error"] == "Script timed out after 0.5 seconds"
+    assert result["stdout"] == "started\n"
+    assert tools.failed_count == 1
+    assert tools.log[-1].status == "failed"
+
+
+def test_background_chat_run_failure_is_reported(client, monkeypatch):
+    project_id = client.post("/projects", json={"name": "Failing Chat"}).json()["id"]
+
+    def broken_agent(**_: object):
+        raise RuntimeError("bad model config")
+
+    monkeypatch.setattr(agent_service, "get_agent", broken_agent)
+    resp = client.post(
+        f"/projects/{project_id}/agent/chat",
+        json={"content": "List files.", "auto_run": True, "background": True},
+    )
+    assert resp.status_code == 201
+    run_id = resp.json()["run"]["id"]
+    run_resp = client.get(f"/projects/{project_id}/agent/runs/{run_id}")
+    assert run_resp.json()["status"] == "failed"
+    messages = client.get(f"/projects/{project_id}/agent/chat/messages").json()
+    assert messages[-1]["content"] == f"Run {run_id} failed: bad model config"
+
+
+def test_failed_dataset_run_is_marked_failed(client, tmp_path: Path, monkeypatch):
+    project_id = client.post("/projects", json={"name": "Failing Run"}).json()["id"]
+    source_path = tmp_path / "sample.csv"
+    source_path.write_text("a,b\n1,2\n")
+    dataset_id = client.post(
+        f"/projects/{project_id}/datasets",
+        json={"name": "sample.csv", "source": str(source_path)},
+    ).json()["id"]
+    run_id = client.post(
+        f"/projects/{project_id}/runs",
+        json={"dataset_id": dataset_id, "type": "profile", "background": True},
+    ).json()["id"]
+
+    def broken_profile(_: str) -> None:
+        raise RuntimeError("profiling failed")
+
+    monkeypatch.setattr(store, "_profile_dataset", broken_profile)
+    with pytest.raises(RuntimeError):
+        store.execute_run(project_id, run_id, dataset_id, "profile")
+    run = client.get(f"/projects/{project_id}/runs/{run_id}").json()
+    assert run["status"] == "failed"
+    assert run["finished_at"] is not None
+
+
+def test_write_file_keeps_existing_mode(client, tmp_path: Path):
+    script = tmp_path / "run.sh"
+    script.write_text("echo old\n")
+    script.chmod(0o750)
+    tools = agent_service.ProjectToolRuntime(project_id="p", workspace_root=tmp_path)
+    assert tools.write_file("run.sh", "echo new\n") == {"path": "run.sh", "bytes": 9}
+    assert script.read_text() == "echo new\n"
+    assert script.stat().st_mode & 0o777 == 0o750
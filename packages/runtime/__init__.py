@@ -1,4 +1,13 @@
-from .agent import AgentDeps, AgentPolicy, LLMError, ToolRuntime, build_agent, repo_root, validate_path
+from .agent import (
+	AgentDeps,
+	AgentPolicy,
+	LLMError,
+	ToolRuntime,
+	build_agent,
+	get_agent,
+	repo_root,
+	validate_path,
+)
 
 __all__ = [
 	"AgentDeps",
@@ -6,6 +15,7 @@ __all__ = [
 	"LLMError",
 	"ToolRuntime",
 	"build_agent",
+	"get_agent",
 	"repo_root",
 	"validate_path",
 ]
@@ -1,4 +1,4 @@
-from .llm import AgentDeps, LLMError, ToolRuntime, build_agent
+from .llm import AgentDeps, LLMError, ToolRuntime, build_agent, get_agent
 from .policy import AgentPolicy, repo_root, validate_path
 
 __all__ = [
@@ -6,6 +6,7 @@ __all__ = [
     "LLMError",
     "ToolRuntime",
     "build_agent",
+    "get_agent",
     "AgentPolicy",
     "repo_root",
     "validate_path",
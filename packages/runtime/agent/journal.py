@@ -2,10 +2,12 @@ from __future__ import annotations
 
 from typing import Any
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, TypeAdapter
 
 from .models import ActionRecord, Approval, PlanStep, StepStatus, ToolResult, _now
 
+_ACTION_RECORD_LIST_ADAPTER = TypeAdapter(list[ActionRecord])
+
 
 class ActionJournal(BaseModel):
     records: list[ActionRecord] = Field(default_factory=list)
@@ -59,4 +61,4 @@ class ActionJournal(BaseModel):
         return record
 
     def to_log(self) -> list[dict[str, Any]]:
-        return [record.model_dump(mode="json") for record in self.records]
+        return _ACTION_RECORD_LIST_ADAPTER.dump_python(self.records, mode="json")
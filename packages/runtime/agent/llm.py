@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
+from functools import lru_cache
 from typing import Any, Protocol
 import os
 
@@ -193,3 +194,17 @@ def build_agent(
     return agent
 
 
+@lru_cache(maxsize=32)
+def _cached_agent(
+    model_name: str,
+    instructions: str | None,
+    extra_instructions: str | None,
+) -> Agent[AgentDeps, str]:
+    return build_agent(instructions=instructions, extra_instructions=extra_instructions)
+
+
+def get_agent(
+    instructions: str | None = None,
+    extra_instructions: str | None = None,
+) -> Agent[AgentDeps, str]:
+    return _cached_agent(_model_name(), instructions, extra_instructions)
@@ -33,9 +33,9 @@ class ToolRouter:
         return list(self._tools.values())
 
     def call(self, name: str, args: dict[str, Any], approved: bool = False) -> ToolResult:
-        if name not in self._tools:
+        tool = self._tools.get(name)
+        if tool is None:
             raise KeyError(f"Tool not registered: {name}")
-        tool = self._tools[name]
         if tool.destructive and self._policy.require_approval_for_destructive and not approved:
             raise PermissionError(f"Approval required for tool: {name}")
         if tool.args_model:
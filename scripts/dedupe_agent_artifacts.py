@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""One-off migration: remove duplicate agent artifact rows.
+
+Agent artifacts are upserted on (project_id, run_id, path), which needs the
+ux_agentartifact_project_run_path unique index. Databases created before that
+index existed can hold duplicate rows, and the API refuses to start until they
+are removed. This keeps the newest row per (project_id, run_id, path), deletes
+the rest, and creates the index.
+
+Usage:
+  uv run python scripts/dedupe_agent_artifacts.py [--db PATH] [--dry-run]
+"""
+
+from __future__ import annotations
+
+import argparse
+import sqlite3
+import sys
+from pathlib import Path
+
+DEFAULT_DB = Path(__file__).resolve().parents[1] / "apps" / "api" / "app.db"
+
+_DUPLICATES_SQL = (
+    "SELECT COUNT(*) FROM agentartifact WHERE run_id IS NOT NULL AND rowid NOT IN ("
+    "SELECT MAX(rowid) FROM agentartifact WHERE run_id IS NOT NULL "
+    "GROUP BY project_id, run_id, path)"
+)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", type=Path, default=DEFAULT_DB, help="Path to the API sqlite database")
+    parser.add_argument("--dry-run", action="store_true", help="Only report how many rows would be deleted")
+    args = parser.parse_args()
+
+    if not args.db.is_file():
+        print(f"Database not found: {args.db}", file=sys.stderr)
+        return 1
+    conn = sqlite3.connect(args.db)
+    try:
+        duplicates = conn.execute(_DUPLICATES_SQL).fetchone()[0]
+        print(f"Duplicate agent artifact rows: {duplicates}")
+        if args.dry_run:
+            return 0
+        with conn:
+            conn.execute(_DUPLICATES_SQL.replace("SELECT COUNT(*)", "DELETE", 1))
+            conn.execute(
+                "CREATE UNIQUE INDEX IF NOT EXISTS ux_agentartifact_project_run_path "
+                "ON agentartifact (project_id, run_id, path)"
+            )
+        print(f"Deleted {duplicates} rows and created ux_agentartifact_project_run_path")
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())